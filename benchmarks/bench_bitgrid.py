@@ -0,0 +1,78 @@
+import argparse
+import time
+
+import numpy as np
+
+from bitgrid import BitGrid, words_per_row
+
+# Memory and throughput of the bit-packed grid on a random size x size grid:
+# population count, an XOR mask and majority-rule steps, reported as cells
+# and bytes of packed words per second. With --dense the same step is timed
+# on a plain uint8 array for comparison (needs ~20 bytes per cell).
+#
+#     python -m benchmarks.bench_bitgrid --size 10000 --steps 3
+
+
+def best_time(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+# Random n x n grid, drawn straight as words so no n * n array is needed
+def random_grid(rng, n):
+    words = rng.integers(0, 1 << 64, size=(n, words_per_row(n)), dtype=np.uint64)
+    grid = BitGrid.from_words(words, n)
+    grid._clear_padding(grid.words)
+    return grid
+
+
+def dense_majority(cells):
+    padded = np.pad(cells, 1)
+    rows, cols = cells.shape
+    counts = np.zeros((rows, cols), dtype=np.uint8)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            if (dx, dy) != (0, 0):
+                counts += padded[1 + dx:rows + 1 + dx, 1 + dy:cols + 1 + dy]
+    return np.where(cells == 1, counts >= 4, counts >= 5).astype(np.uint8)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bit-packed grid benchmark')
+    parser.add_argument('--size', type=int, default=10000)
+    parser.add_argument('--steps', type=int, default=3)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--dense', action='store_true')
+    args = parser.parse_args()
+
+    n = args.size
+    rng = np.random.default_rng(0)
+    grid, mask = random_grid(rng, n), random_grid(rng, n)
+    cells, nbytes = grid.size, grid.nbytes
+    print(f'{n}x{n}: {cells:,} cells in {nbytes / 2**20:.1f} MB of words')
+
+    rows = []
+    seconds = best_time(grid.popcount, args.repeat)
+    rows.append(('popcount', seconds))
+    seconds = best_time(lambda: grid ^ mask, args.repeat)
+    rows.append(('xor mask', seconds))
+    start = time.perf_counter()
+    grid.run(args.steps)
+    rows.append(('majority step', (time.perf_counter() - start) / args.steps))
+    if args.dense:
+        dense = grid.to_array()
+        seconds = best_time(lambda: dense_majority(dense), 1)
+        rows.append(('dense uint8 step', seconds))
+
+    print(f"{'operation':>18} {'ms':>10} {'Mcells/s':>10} {'GB/s':>8}")
+    for name, seconds in rows:
+        print(f'{name:>18} {seconds * 1e3:10.1f} {cells / seconds / 1e6:10.0f} '
+              f'{nbytes / seconds / 1e9:8.2f}')
+
+
+if __name__ == '__main__':
+    main()
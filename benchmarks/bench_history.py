@@ -0,0 +1,68 @@
+import argparse
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from grid_engine import GridEngine
+from history import History
+
+# Cost of the undo / replay history on a size x size grid: recording clicks
+# (a mix of resonance and cell writes), the disk it takes, seeking back to
+# old versions, and a restart that restores the latest version from the
+# directory.
+#
+#     python -m benchmarks.bench_history --sizes 100 1000 --clicks 5000
+
+
+def bench(size, clicks, every, lazy):
+    rng = np.random.default_rng(0)
+    matrix = rng.integers(0, 10, (size, size))
+    with tempfile.TemporaryDirectory() as directory:
+        history = History(directory, checkpoint_every=every)
+        engine = GridEngine(matrix, lazy=lazy)
+        history.attach(engine)
+        start = time.perf_counter()
+        for kind, x, y, value in zip(rng.random(clicks) < 0.8, rng.integers(0, size, clicks),
+                                     rng.integers(0, size, clicks), rng.integers(0, 10, clicks)):
+            if kind:
+                engine.apply_resonance(int(value))
+            else:
+                engine.set_value(int(x), int(y), int(value))
+        record_us = (time.perf_counter() - start) / clicks * 1e6
+        history.close()
+        disk = sum(os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory))
+
+        history = History(directory, checkpoint_every=every)
+        start = time.perf_counter()
+        history.attach(GridEngine(matrix, lazy=lazy))
+        restore_ms = (time.perf_counter() - start) * 1e3
+        targets = rng.integers(0, engine.version + 1, 20)
+        start = time.perf_counter()
+        for version in targets.tolist():
+            history.state_at(version)
+        seek_ms = (time.perf_counter() - start) / len(targets) * 1e3
+        history.close()
+    return record_us, disk, restore_ms, seek_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grid history benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000])
+    parser.add_argument('--clicks', type=int, default=5000)
+    parser.add_argument('--every', type=int, default=256, help='records per checkpoint')
+    args = parser.parse_args()
+
+    print(f"{'grid':>10} {'mode':>6} {'record us':>10} {'disk MB':>9} {'restore ms':>11} "
+          f"{'seek ms':>8}")
+    for size in args.sizes:
+        for lazy in (True, False):
+            record_us, disk, restore_ms, seek_ms = bench(size, args.clicks, args.every, lazy)
+            mode = 'lazy' if lazy else 'eager'
+            print(f"{f'{size}x{size}':>10} {mode:>6} {record_us:10.1f} {disk / 2**20:9.2f} "
+                  f'{restore_ms:11.1f} {seek_ms:8.1f}')
+
+
+if __name__ == '__main__':
+    main()
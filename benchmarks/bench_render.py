@@ -0,0 +1,113 @@
+import argparse
+import random
+import sys
+import time
+import types
+
+import numpy as np
+
+from grid_engine import GridEngine
+
+# Frame time of the rectangle renderers against the PhotoImage blit at
+# several grid sizes, in a 1000x1000 window.
+#
+#     python -m benchmarks.bench_render --sizes 100 200 500 1000 2000
+#
+# Without a display, Tk is replaced by a recording stub so the Python-side
+# cost of each path is still measured; the output says which one ran.
+
+
+class StubCanvas:
+    def __init__(self, *args, **kwargs):
+        self.next_id = 0
+
+    def pack(self):
+        pass
+
+    def delete(self, tag):
+        pass
+
+    def create_rectangle(self, *args, **kwargs):
+        self.next_id += 1
+        return self.next_id
+
+    def create_image(self, *args, **kwargs):
+        return 0
+
+    def itemconfig(self, item, **kwargs):
+        pass
+
+
+class StubPhotoImage:
+    def __init__(self, **kwargs):
+        pass
+
+    def configure(self, **kwargs):
+        pass
+
+
+def open_window():
+    try:
+        import tkinter as tk
+        root = tk.Tk()
+        canvas = tk.Canvas(root, width=1000, height=1000)
+        canvas.pack()
+        return root, canvas, 'tk'
+    except Exception:
+        stub = types.ModuleType('tkinter')
+        stub.PhotoImage = StubPhotoImage
+        sys.modules['tkinter'] = stub
+        return None, StubCanvas(), 'stub'
+
+
+def timed(fn, root):
+    start = time.perf_counter()
+    fn()
+    if root is not None:
+        root.update()
+    return (time.perf_counter() - start) * 1e3
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grid rendering frame-time benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 200, 500, 1000, 2000])
+    parser.add_argument('--rect-max', type=int, default=500,
+                        help='largest side to draw with rectangles')
+    args = parser.parse_args()
+
+    root, canvas, mode = open_window()
+    from tk_render import CanvasRenderer, ImageRenderer
+
+    print(f'renderer timings in ms ({mode})')
+    print(f"{'size':>10} {'full redraw':>12} {'retained':>10} {'image':>8}")
+    for n in args.sizes:
+        engine = GridEngine(np.random.default_rng(n).integers(0, 10, (n, n)))
+        cell_size = max(1000 // n, 1)
+        full = retained = '-'
+        if n <= args.rect_max:
+            def full_redraw():
+                canvas.delete("all")
+                size = cell_size
+                for index, color in enumerate(engine.colors()):
+                    x, y = divmod(index, n)
+                    canvas.create_rectangle(y * size, x * size, (y + 1) * size, (x + 1) * size,
+                                            fill=color, outline='')
+            full = f'{timed(full_redraw, root):.1f}'
+            renderer = CanvasRenderer(canvas, cell_size)
+            renderer.update(engine)
+            engine.apply_resonance(random.randint(1, 9))
+            retained = f'{timed(lambda: renderer.update(engine), root):.1f}'
+            canvas.delete("all")
+        renderer = ImageRenderer(canvas, 1000, 1000, cell_size)
+        if n > 1000:
+            renderer.zoom(1000 / n / cell_size)
+        engine.apply_resonance(random.randint(1, 9))
+        image = timed(lambda: renderer.update(engine), root)
+        canvas.delete("all")
+        print(f"{f'{n}x{n}':>10} {full:>12} {retained:>10} {image:8.1f}")
+    if root is not None:
+        root.destroy()
+
+
+if __name__ == '__main__':
+    main()
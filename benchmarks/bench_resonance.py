@@ -0,0 +1,77 @@
+import argparse
+import colorsys
+import random
+import time
+
+from grid_engine import GridEngine
+
+# Per-click latency of the resonance grid: the original Cell-object loop
+# against the array-backed GridEngine. Run from the repo root:
+#
+#     python -m benchmarks.bench_resonance --sizes 100 1000 4000
+
+
+# The object-based path as it was before GridEngine
+class LegacyCell:
+    def __init__(self, value):
+        self.value = value
+        self.color = self.calculate_color()
+
+    def calculate_color(self):
+        hue = (self.value * 36) % 360
+        r, g, b = colorsys.hls_to_rgb(hue / 360, 0.5, 1)
+        return f'#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}'
+
+
+def legacy_click(grid, frequency):
+    for row in grid:
+        for cell in row:
+            cell.value = (cell.value + frequency) % 10
+            cell.color = cell.calculate_color()
+    total_r = total_g = total_b = 0
+    for row in grid:
+        for cell in row:
+            total_r += int(cell.color[1:3], 16)
+            total_g += int(cell.color[3:5], 16)
+            total_b += int(cell.color[5:7], 16)
+    total_cells = len(grid) * len(grid[0])
+    return f'#{int(total_r / total_cells):02x}{int(total_g / total_cells):02x}{int(total_b / total_cells):02x}'
+
+
+def engine_click(engine, frequency):
+    engine.apply_resonance(frequency)
+    return engine.average_color()
+
+
+def time_clicks(click, grid, clicks):
+    best = float('inf')
+    for _ in range(clicks):
+        frequency = random.randint(1, 9)
+        start = time.perf_counter()
+        click(grid, frequency)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resonance click latency benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 4000])
+    parser.add_argument('--clicks', type=int, default=5)
+    parser.add_argument('--legacy-max', type=int, default=1000,
+                        help='largest side to run the object-based path on')
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'objects ms':>12} {'engine ms':>12} {'speedup':>9}")
+    for n in args.sizes:
+        matrix = [[random.randint(0, 9) for _ in range(n)] for _ in range(n)]
+        engine_ms = time_clicks(engine_click, GridEngine(matrix), args.clicks) * 1e3
+        if n <= args.legacy_max:
+            legacy = [[LegacyCell(value) for value in row] for row in matrix]
+            legacy_ms = time_clicks(legacy_click, legacy, args.clicks) * 1e3
+            print(f"{f'{n}x{n}':>10} {legacy_ms:12.2f} {engine_ms:12.2f} {legacy_ms / engine_ms:8.0f}x")
+        else:
+            print(f"{f'{n}x{n}':>10} {'skipped':>12} {engine_ms:12.2f} {'-':>9}")
+
+
+if __name__ == '__main__':
+    main()
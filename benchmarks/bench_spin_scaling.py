@@ -0,0 +1,38 @@
+import argparse
+import os
+import time
+
+import numpy as np
+
+from spin_grid import SpinGrid
+
+# Strong-scaling benchmark for the parallel spin mode. Every worker count runs
+# the same steps on the same grid and is checked against the serial result.
+#
+#     python -m benchmarks.bench_spin_scaling --size 8000 --steps 32 --workers 1 2 4 8
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Parallel spin scaling benchmark')
+    parser.add_argument('--size', type=int, default=2000)
+    parser.add_argument('--steps', type=int, default=16)
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    matrix = np.random.default_rng(0).integers(0, 10, (args.size, args.size))
+    print(f'{args.size}x{args.size}, {args.steps} steps, {os.cpu_count()} cpus')
+    print(f"{'workers':>8} {'seconds':>10} {'speedup':>9} {'identical':>10}")
+    reference = baseline = None
+    for workers in args.workers:
+        grid = SpinGrid(matrix)
+        start = time.perf_counter()
+        grid.run(args.steps, workers=workers)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference, baseline = grid.padded, elapsed
+        identical = bool((grid.padded == reference).all())
+        print(f'{workers:8d} {elapsed:10.2f} {baseline / elapsed:8.2f}x {str(identical):>10}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import grid_loader
+
+# Cold start of the server entry points, each import in a fresh interpreter:
+#
+#   pandas   what every entry point used to pay: import pandas and
+#            pd.read_csv('a.csv') before importing the module
+#   csv      grid_loader with no sidecar yet: numpy parses a.csv and writes it
+#   cached   grid_loader memory-mapping the a.csv.grid sidecar
+#
+# followed by the loader alone, in process, on a synthetic CSV per --sizes.
+#
+#     python -m benchmarks.bench_startup --repeat 5 --sizes 100 2000
+
+MODES = {
+    'pandas': "import pandas as pd; pd.read_csv('a.csv', header=None).values.tolist(); ",
+    'csv': '',
+    'cached': '',
+}
+
+CHILD = '''import resource, time
+start = time.perf_counter()
+{setup}import {module}
+print(time.perf_counter() - start, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+'''
+
+
+def run_once(module, mode):
+    if mode == 'csv':
+        try:
+            os.remove(grid_loader.cache_path('a.csv'))
+        except FileNotFoundError:
+            pass
+    elif mode == 'cached':
+        grid_loader.load_grid('a.csv')
+    code = CHILD.format(setup=MODES[mode], module=module)
+    start = time.perf_counter()
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True,
+                            text=True).stdout.split()
+    wall = time.perf_counter() - start
+    import_time, max_rss = float(output[-2]), int(output[-1])
+    return wall, import_time, max_rss
+
+
+def best_ms(fn, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3
+
+
+def bench_loader(size, repeat):
+    import pandas as pd
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'grid.csv')
+        matrix = np.random.default_rng(0).integers(0, 10, (size, size))
+        np.savetxt(path, matrix, fmt='%d', delimiter=',')
+        pandas_ms = best_ms(lambda: pd.read_csv(path, header=None).values.tolist(), repeat)
+        csv_ms = best_ms(lambda: grid_loader.load_grid(path, use_cache=False), repeat)
+        grid_loader.load_grid(path)
+        cached_ms = best_ms(lambda: grid_loader.load_grid(path), repeat)
+    return pandas_ms, csv_ms, cached_ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Entry point cold start benchmark')
+    parser.add_argument('--modules', nargs='+', default=['server', 'server_async'])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 2000])
+    args = parser.parse_args()
+
+    print(f"{'module':>14} {'mode':>8} {'process ms':>11} {'import ms':>10} {'max RSS MB':>11}")
+    for module in args.modules:
+        for mode in MODES:
+            runs = [run_once(module, mode) for _ in range(args.repeat)]
+            wall = statistics.median(r[0] for r in runs) * 1e3
+            import_time = statistics.median(r[1] for r in runs) * 1e3
+            max_rss = statistics.median(r[2] for r in runs) / 1024
+            print(f'{module:>14} {mode:>8} {wall:11.1f} {import_time:10.1f} {max_rss:11.1f}')
+
+    print(f"\n{'grid':>14} {'pandas ms':>10} {'csv ms':>10} {'cached ms':>10}")
+    for size in args.sizes:
+        pandas_ms, csv_ms, cached_ms = bench_loader(size, args.repeat)
+        print(f"{f'{size}x{size}':>14} {pandas_ms:10.2f} {csv_ms:10.2f} {cached_ms:10.3f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+import argparse
+import csv
+import time
+
+import numpy as np
+
+import server
+
+# Payload size and encode time of the /grid JSON color_codes map against the
+# binary wire format, on a.csv tiled up to each grid size.
+#
+#     python -m benchmarks.bench_wire --sizes 100 2000
+
+
+def tiled_grid(n):
+    with open('a.csv') as f:
+        base = np.array([[int(v) for v in row] for row in csv.reader(f)])
+    reps = (-(-n // base.shape[0]), -(-n // base.shape[1]))
+    return np.tile(base, reps)[:n, :n]
+
+
+def best_time(fn, repeat):
+    best, result = float('inf'), None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e3, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grid wire format benchmark')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100, 2000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'size':>10} {'format':>12} {'bytes':>12} {'encode ms':>10}")
+    with server.app.app_context():
+        for n in args.sizes:
+            manager = server.GridManager(tiled_grid(n))
+            manager.apply_resonance(3)
+            encoders = [('json', server.encode_json)] + [
+                (f'binary-{c}', server.binary_encoder(c)) for c in ('none', 'zlib', 'rle')]
+            for name, encode in encoders:
+                ms, payload = best_time(lambda: encode(manager, manager.snapshot), args.repeat)
+                print(f"{f'{n}x{n}':>10} {name:>12} {len(payload):12d} {ms:10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+import argparse
+import asyncio
+import json
+import time
+from urllib.parse import urlsplit
+
+import numpy as np
+
+# HTTP load test for the grid servers: keep-alive connections that poll
+# /grid (revalidating with If-None-Match, like a browser) and send a share of
+# POST /click, plus optional idle SSE clients on /grid/stream. Reports
+# requests per second and latency percentiles per target. Start the servers
+# first, e.g.
+#
+#     flask --app server run --port 5000 --with-threads
+#     uvicorn server_async:app --port 8001
+#     python -m benchmarks.load_test http://127.0.0.1:5000 http://127.0.0.1:8001 \
+#         --connections 64 --streams 1000
+
+# Full-grid SSE events are one line of a few hundred kB
+STREAM_LIMIT = 1 << 24
+
+
+async def connect(url):
+    return await asyncio.open_connection(url.hostname, url.port or 80, limit=STREAM_LIMIT)
+
+
+async def read_response(reader):
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError('connection closed')
+    status = int(status_line.split()[1])
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    if headers.get('transfer-encoding') == 'chunked':
+        body = b''
+        while True:
+            size = int((await reader.readline()).strip(), 16)
+            chunk = await reader.readexactly(size + 2)
+            if size == 0:
+                break
+            body += chunk[:-2]
+    else:
+        body = await reader.readexactly(int(headers.get('content-length', 0)))
+    return status, headers, body
+
+
+def request_bytes(host, method, path, headers=(), body=b''):
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {host}', *headers]
+    if body:
+        lines += ['Content-Type: application/json', f'Content-Length: {len(body)}']
+    return ('\r\n'.join(lines) + '\r\n\r\n').encode() + body
+
+
+async def client(target, deadline, click_share, seed, latencies, counts):
+    url = urlsplit(target)
+    reader, writer = await connect(url)
+    rng = np.random.default_rng(seed)
+    etag = None
+    try:
+        while time.perf_counter() < deadline:
+            if rng.random() < click_share:
+                body = json.dumps({'frequency': int(rng.integers(1, 10))}).encode()
+                request = request_bytes(url.netloc, 'POST', '/click', body=body)
+            else:
+                headers = [f'If-None-Match: {etag}'] if etag else []
+                request = request_bytes(url.netloc, 'GET', '/grid', headers)
+            start = time.perf_counter()
+            writer.write(request)
+            status, headers, _ = await read_response(reader)
+            latencies.append(time.perf_counter() - start)
+            counts[status] = counts.get(status, 0) + 1
+            etag = headers.get('etag', etag)
+            if headers.get('connection', '').lower() == 'close':
+                writer.close()
+                reader, writer = await connect(url)
+    finally:
+        writer.close()
+
+
+async def stream_client(target, deadline, events):
+    url = urlsplit(target)
+    try:
+        reader, writer = await connect(url)
+    except OSError:
+        events['failed'] = events.get('failed', 0) + 1
+        return
+    writer.write(request_bytes(url.netloc, 'GET', '/grid/stream?since=-1'))
+    try:
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            line = await asyncio.wait_for(reader.readline(), remaining)
+            if not line:
+                break
+            if line.startswith(b'event:'):
+                events['received'] = events.get('received', 0) + 1
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        writer.close()
+
+
+async def run(target, args):
+    deadline = time.perf_counter() + args.seconds
+    latencies, counts, events = [], {}, {}
+    streams = [asyncio.ensure_future(stream_client(target, deadline, events))
+               for _ in range(args.streams)]
+    start = time.perf_counter()
+    await asyncio.gather(*(client(target, deadline, args.clicks, i, latencies, counts)
+                           for i in range(args.connections)))
+    elapsed = time.perf_counter() - start
+    await asyncio.gather(*streams)
+    return elapsed, np.array(latencies) * 1e3, counts, events
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grid server HTTP load test')
+    parser.add_argument('targets', nargs='+', help='base URLs, e.g. http://127.0.0.1:5000')
+    parser.add_argument('--connections', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--clicks', type=float, default=0.1, help='share of requests that click')
+    parser.add_argument('--streams', type=int, default=0, help='idle SSE clients held open')
+    args = parser.parse_args()
+
+    print(f"{'target':>28} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+          f"{'max ms':>8} {'events':>8}  statuses")
+    for target in args.targets:
+        elapsed, latencies, counts, events = asyncio.run(run(target, args))
+        if not len(latencies):
+            print(f'{target:>28} no responses')
+            continue
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        statuses = ' '.join(f'{status}:{n}' for status, n in sorted(counts.items()))
+        if events.get('failed'):
+            statuses += f" streams-failed:{events['failed']}"
+        print(f'{target:>28} {len(latencies) / elapsed:9.0f} {p50:8.2f} {p95:8.2f} {p99:8.2f} '
+              f"{latencies.max():8.2f} {events.get('received', 0):8d}  {statuses}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,230 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+
+import numpy as np
+
+import wire
+from benchmarks.bench_render import StubCanvas, StubPhotoImage
+
+# Benchmark suite over every grid front end, effect and grid size. Each case
+# is timed (best of --repeat runs) and then run once more under tracemalloc
+# for its peak memory; numpy reports its buffers to tracemalloc, so array
+# allocations count too. Results are compared against a stored baseline, and
+# the exit status is 1 when any case got slower or bigger by more than
+# --threshold.
+#
+#     python -m benchmarks.run --save             # record benchmarks/baseline.json
+#     python -m benchmarks.run                    # compare against it
+#     python -m benchmarks.run --sizes 100 1000 --cases spin spiral
+#
+# Tk is always replaced by a stub, so the suite runs headless and measures
+# only the Python side of the Tk front ends. /grid goes through the Flask
+# test client.
+
+DEFAULT_SIZES = [100, 500, 1000, 2000, 4000]
+BASELINE = os.path.join(os.path.dirname(__file__), 'baseline.json')
+# Changes smaller than this are noise however large in relative terms
+MIN_SECONDS = 1e-4
+MIN_BYTES = 64 * 1024
+
+FRONT_ENDS = ['main', 'resonant', 'xyz0', 'random7']
+
+
+class StubRoot:
+    def title(self, text=None):
+        pass
+
+
+def install_tk_stub():
+    stub = types.ModuleType('tkinter')
+    stub.Tk = StubRoot
+    stub.Canvas = StubCanvas
+    stub.PhotoImage = StubPhotoImage
+    sys.modules['tkinter'] = stub
+
+
+# Each case builds its state from an (n, n) int matrix and returns the call
+# to time; setup is not measured
+
+def grid_construction(module):
+    def setup(matrix):
+        grid_class = importlib.import_module(module).ResonanceGrid
+        return lambda: grid_class(matrix)
+    return setup
+
+
+def manager_construction(matrix):
+    from grid_service import GridManager
+    return lambda: GridManager(matrix)
+
+
+def apply_resonance(module):
+    def setup(matrix):
+        grid, root = importlib.import_module(module).ResonanceGrid(matrix), StubRoot()
+        return lambda: grid.apply_resonance(random.randint(1, 9), root)
+    return setup
+
+
+def average_color(matrix):
+    from grid_engine import GridEngine
+    engine = GridEngine(matrix)
+    return engine.average_color
+
+
+def spin_cells(matrix):
+    grid = importlib.import_module('rekeying').GameGrid(matrix)
+    return grid.spin_cells
+
+
+def apply_spiral_effect(matrix):
+    grid = importlib.import_module('network').GameGrid(matrix)
+    n = len(matrix)
+    return lambda: grid.apply_spiral_effect(random.randrange(n), random.randrange(n), 50)
+
+
+def csv_load(use_cache):
+    def setup(matrix):
+        from grid_loader import load_grid
+        # Removed once the returned call is garbage collected
+        directory = tempfile.TemporaryDirectory()
+        path = os.path.join(directory.name, 'grid.csv')
+        np.savetxt(path, matrix, fmt='%d', delimiter=',')
+        if use_cache:
+            load_grid(path)
+
+        def load():
+            return directory, load_grid(path, use_cache=use_cache)
+        return load
+    return setup
+
+
+# GET /grid right after a click, so every request serializes a new version
+def grid_request(accept):
+    def setup(matrix):
+        import server
+        from grid_service import GridManager
+        server.grid_manager = GridManager(matrix, lazy=True)
+        client = server.app.test_client()
+
+        def request():
+            server.grid_manager.apply_resonance(random.randint(1, 9))
+            response = client.get('/grid', headers={'Accept': accept})
+            assert response.status_code == 200
+        return request
+    return setup
+
+
+# name -> (setup, largest side it runs at)
+CASES = {}
+for module in FRONT_ENDS:
+    CASES[f'construct/{module}'] = (grid_construction(module), 4000)
+    CASES[f'resonance/{module}'] = (apply_resonance(module), 4000)
+CASES['construct/grid_service'] = (manager_construction, 4000)
+CASES['average_color/engine'] = (average_color, 4000)
+CASES['spin/rekeying'] = (spin_cells, 4000)
+CASES['spiral/network'] = (apply_spiral_effect, 4000)
+CASES['csv_load/parse'] = (csv_load(False), 2000)
+CASES['csv_load/cached'] = (csv_load(True), 4000)
+CASES['grid/json'] = (grid_request('application/json'), 1000)
+CASES['grid/binary'] = (grid_request(wire.MIME_TYPE), 4000)
+
+
+def measure(setup, matrix, repeat):
+    run = setup(matrix)
+    run()
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        run()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        run()
+        peak = tracemalloc.get_traced_memory()[1] - before
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def compare(result, base, threshold):
+    flags = []
+    if result['seconds'] - base['seconds'] > max(base['seconds'] * threshold, MIN_SECONDS):
+        flags.append('SLOWER')
+    if result['peak_bytes'] - base['peak_bytes'] > max(base['peak_bytes'] * threshold, MIN_BYTES):
+        flags.append('BIGGER')
+    return flags
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Grid benchmark suite with baseline comparison')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES)
+    parser.add_argument('--cases', nargs='+', help='run only cases whose name contains one of these')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--save', action='store_true', help='write the results as the baseline')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='relative slowdown or memory growth that counts as a regression')
+    args = parser.parse_args()
+
+    install_tk_stub()
+    baseline = {}
+    if not args.save and os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+
+    names = [name for name in CASES
+             if not args.cases or any(part in name for part in args.cases)]
+    results, regressions = {}, []
+    print(f"{'case':>22} {'size':>10} {'ms':>10} {'peak MB':>9} {'base ms':>10} {'change':>8}")
+    for n in args.sizes:
+        matrix = np.random.default_rng(n).integers(0, 10, (n, n))
+        for name in names:
+            setup, max_size = CASES[name]
+            if n > max_size:
+                continue
+            random.seed(n)
+            seconds, peak = measure(setup, matrix, args.repeat)
+            key = f'{name}@{n}'
+            result = results[key] = {'seconds': seconds, 'peak_bytes': peak}
+            base = baseline.get(key)
+            base_ms = change = ''
+            if base is not None:
+                base_ms = f"{base['seconds'] * 1e3:.2f}"
+                change = f"{(seconds / base['seconds'] - 1) * 100:+.0f}%"
+                flags = compare(result, base, args.threshold)
+                if flags:
+                    regressions.append((key, flags))
+                    change += ' ' + '/'.join(flags)
+            print(f"{name:>22} {f'{n}x{n}':>10} {seconds * 1e3:10.2f} {peak / 2**20:9.1f} "
+                  f'{base_ms:>10} {change:>8}')
+
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump({
+                'python': platform.python_version(),
+                'numpy': np.__version__,
+                'machine': platform.platform(),
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+        print(f'saved {len(results)} results to {args.baseline}')
+    elif not baseline:
+        print(f'no baseline at {args.baseline}; run with --save to record one')
+    if regressions:
+        print(f'{len(regressions)} regressions beyond {args.threshold:.0%}:')
+        for key, flags in regressions:
+            print(f"  {key}: {', '.join(flags)}")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+import argparse
+import hashlib
+import multiprocessing as mp
+import os
+import random
+import time
+
+import numpy as np
+
+from server import GridManager
+from shared_store import SharedGridStore
+
+# Several processes serving one SharedGridStore, the way gunicorn workers
+# would. Every worker interleaves clicks and cell writes with reads of the
+# full grid, then all of them compare what they see. With proper
+# synchronization no write is lost (the final version is the total number of
+# writes) and every worker ends on the same state.
+#
+#     python -m benchmarks.shared_workers --workers 4 --writes 500
+
+
+def worker(name, matrix, writes, seed, barrier, results):
+    store = SharedGridStore(name)
+    manager = GridManager(matrix, lazy=True, store=store)
+    rng = random.Random(seed)
+    rows, cols = manager.engine.rows, manager.engine.cols
+    reads = torn = 0
+    start = time.perf_counter()
+    for _ in range(writes):
+        if rng.random() < 0.5:
+            manager.apply_resonance(rng.randint(1, 9))
+        else:
+            manager.set_value(rng.randrange(rows), rng.randrange(cols), rng.randint(0, 9))
+        for _ in range(4):
+            snapshot = manager.current()
+            counts = np.bincount(snapshot.color_indices().ravel(), minlength=10)
+            torn += not np.array_equal(counts, snapshot.counts)
+            reads += 1
+    elapsed = time.perf_counter() - start
+    barrier.wait()
+    snapshot = manager.current()
+    digest = hashlib.sha1(snapshot.current_values().tobytes()).hexdigest()
+    results.put((os.getpid(), snapshot.version, digest, reads / elapsed, torn))
+    store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Shared-memory multi-worker grid check')
+    parser.add_argument('--size', type=int, default=100)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--writes', type=int, default=500)
+    args = parser.parse_args()
+
+    matrix = np.random.default_rng(0).integers(0, 10, (args.size, args.size))
+    name = f'sight-check-{os.getpid()}'
+    store = SharedGridStore(name, matrix)
+    ctx = mp.get_context('spawn')
+    barrier = ctx.Barrier(args.workers)
+    results = ctx.Queue()
+    processes = [ctx.Process(target=worker, args=(name, matrix, args.writes, i, barrier, results))
+                 for i in range(args.workers)]
+    try:
+        for p in processes:
+            p.start()
+        rows = [results.get() for _ in processes]
+        for p in processes:
+            p.join()
+    finally:
+        store.close()
+        store.unlink()
+
+    print(f"{'pid':>8} {'version':>8} {'reads/s':>10} {'torn':>5}  state")
+    for pid, version, digest, rate, torn in rows:
+        print(f'{pid:8d} {version:8d} {rate:10.0f} {torn:5d}  {digest[:12]}')
+    expected = args.workers * args.writes
+    ok = all(r[1] == expected for r in rows) and len({r[2] for r in rows}) == 1 \
+        and not any(r[4] for r in rows)
+    print(f"expected version {expected}: {'ok' if ok else 'MISMATCH'}")
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+import argparse
+import random
+import threading
+import time
+
+import numpy as np
+
+import server
+import wire
+
+# Concurrency stress test for GridManager's copy-on-write snapshots. One
+# writer thread clicks (resonance) and sets single cells as fast as it can
+# while reader threads fetch the binary grid and random regions without any
+# locking. The writer records each version's color histogram; a reader whose
+# payload does not match the histogram and average color of the version it
+# claims to be has seen a torn state.
+#
+#     python -m benchmarks.stress_snapshots --readers 32 --seconds 5
+
+
+def writer(manager, expected, stop, counter):
+    rng = random.Random(0)
+    rows, cols = manager.engine.rows, manager.engine.cols
+    while not stop.is_set():
+        if rng.random() < 0.5:
+            manager.apply_resonance(rng.randint(1, 9))
+        else:
+            manager.set_value(rng.randrange(rows), rng.randrange(cols), rng.randint(0, 9))
+        snapshot = manager.snapshot
+        expected[snapshot.version] = snapshot.counts.copy()
+        counter[0] += 1
+
+
+def reader(manager, expected, stop, counter, errors, seed):
+    rng = random.Random(seed)
+    encode = server.binary_encoder('none')
+    rows, cols = manager.engine.rows, manager.engine.cols
+    last_version = -1
+    while not stop.is_set():
+        if rng.random() < 0.5:
+            _, data = manager.serialized('binary-none', encode)
+            payload = wire.decode(data)
+            version = payload['version']
+            counts = np.bincount(payload['indices'].ravel(), minlength=10)
+            totals = counts @ payload['palette'].astype(np.int64)
+            average = '#' + ''.join(f'{int(t / counts.sum()):02x}' for t in totals.tolist())
+            if average != payload['average_color']:
+                errors.append(f'version {version}: average {payload["average_color"]} != {average}')
+            want = expected.get(version)
+            if want is not None and not np.array_equal(counts, want):
+                errors.append(f'version {version}: histogram does not match')
+        else:
+            r0, c0 = rng.randrange(rows), rng.randrange(cols)
+            region = manager.get_region(r0, c0, min(r0 + 16, rows), min(c0 + 16, cols))
+            version = region['version']
+        if version < last_version:
+            errors.append(f'version went back from {last_version} to {version}')
+        last_version = version
+        counter[0] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Snapshot concurrency stress test')
+    parser.add_argument('--size', type=int, default=100)
+    parser.add_argument('--readers', type=int, default=32)
+    parser.add_argument('--seconds', type=float, default=5)
+    parser.add_argument('--eager', action='store_true', help='apply resonance to the array')
+    args = parser.parse_args()
+
+    matrix = np.random.default_rng(0).integers(0, 10, (args.size, args.size))
+    manager = server.GridManager(matrix, lazy=not args.eager)
+    expected = {0: manager.snapshot.counts.copy()}
+    stop = threading.Event()
+    errors = []
+    writes = [0]
+    reads = [[0] for _ in range(args.readers)]
+    threads = [threading.Thread(target=writer, args=(manager, expected, stop, writes))]
+    threads += [threading.Thread(target=reader, args=(manager, expected, stop, reads[i], errors, i))
+                for i in range(args.readers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    time.sleep(args.seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    total_reads = sum(r[0] for r in reads)
+    print(f'{args.size}x{args.size}, 1 writer, {args.readers} readers, {elapsed:.1f} s')
+    print(f'writes {writes[0]:10d} {writes[0] / elapsed:12.0f}/s')
+    print(f'reads  {total_reads:10d} {total_reads / elapsed:12.0f}/s')
+    print(f'final version {manager.version}, {len(errors)} inconsistent reads')
+    for error in errors[:10]:
+        print('  ' + error)
+    if errors:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
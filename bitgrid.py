@@ -0,0 +1,332 @@
+import math
+
+import numpy as np
+
+from grid_engine import RowView
+from palette import Palette
+
+# Bit-packed grid for 0/1 inputs such as candice.txt, one bit per cell.
+#
+# Each row is packed into ceil(cols / 64) uint64 words, column y in bit
+# y % 64 of word y // 64; the padding bits past the last column are always
+# zero. A 10000 x 10000 grid is 12.5 MB. Bulk operations work on whole
+# words: population count, XOR / AND / OR masks, and neighbor counts kept
+# bit-sliced, as four bit planes of the 0-8 count, built from the eight
+# shifted neighbor planes with bitwise half adders. step() applies a
+# life-like rule from those planes a band of rows at a time, so every
+# operation streams over the words once.
+#
+# Cells outside the grid count as 0, like the zero padding in spin_grid.
+# The grid has the display interface of the integer grids (grid[x][y],
+# colors, rgb, rgb_sample, pop_dirty, average_color), colored with
+# BIT_PALETTE.
+
+BIT_PALETTE = Palette([(255, 255, 255), (0, 0, 0)])
+
+# Majority vote over the eight neighbors, ties keep the cell: the binary
+# analogue of the spin grids' neighbor averaging
+MAJORITY = {'born': (5, 6, 7, 8), 'survive': (4, 5, 6, 7, 8)}
+LIFE = {'born': (3,), 'survive': (2, 3)}
+
+# Rows per band in step(), about 1 MB of words
+BAND_BYTES = 1 << 20
+
+ONE = np.uint64(1)
+TOP_BIT = np.uint64(63)
+
+
+def words_per_row(cols):
+    return (cols + 63) // 64
+
+
+# (rows, cols) array of truthy cells -> (rows, words_per_row) uint64 words
+def pack(bits):
+    bits = np.asarray(bits)
+    if bits.ndim != 2:
+        raise ValueError('grid matrix must be two-dimensional')
+    rows, cols = bits.shape
+    padded = np.zeros((rows, words_per_row(cols) * 64), dtype=bool)
+    padded[:, :cols] = bits != 0
+    return np.packbits(padded, axis=1, bitorder='little').view('<u8').astype(np.uint64)
+
+
+# Inverse of pack: (rows, cols) uint8 array of 0 / 1
+def unpack(words, cols):
+    as_bytes = np.ascontiguousarray(words, dtype='<u8').view(np.uint8)
+    return np.unpackbits(as_bytes, axis=1, bitorder='little')[:, :cols]
+
+
+if hasattr(np, 'bitwise_count'):
+    def popcount(words):
+        return int(np.bitwise_count(words).sum(dtype=np.int64))
+else:
+    _BYTE_COUNTS = np.array([bin(i).count('1') for i in range(256)], dtype=np.uint8)
+
+    def popcount(words):
+        return int(_BYTE_COUNTS[np.ascontiguousarray(words).view(np.uint8)].sum(dtype=np.int64))
+
+
+# Add a 0/1 plane into a bit-sliced counter (list of planes, least
+# significant first) with a ripple of half adders
+def _count_into(counter, plane):
+    carry = plane
+    for k, bits in enumerate(counter):
+        counter[k], carry = bits ^ carry, bits & carry
+
+
+# Words where the bit-sliced count equals any of `values`
+def _count_is(counter, values):
+    hit = np.zeros_like(counter[0])
+    for n in values:
+        match = None
+        for k, bits in enumerate(counter):
+            term = bits if n >> k & 1 else ~bits
+            match = term if match is None else match & term
+        hit |= match
+    return hit
+
+
+# View onto one cell with the value / color interface of the other grids
+class BitCellView:
+    __slots__ = ('_engine', 'x', 'y')
+
+    def __init__(self, engine, x, y):
+        self._engine = engine
+        self.x = x
+        self.y = y
+
+    @property
+    def value(self):
+        return self._engine.get_value(self.x, self.y)
+
+    @value.setter
+    def value(self, new_value):
+        self._engine.set_value(self.x, self.y, new_value)
+
+    @property
+    def color(self):
+        return BIT_PALETTE.hex[self.value]
+
+    def calculate_color(self):
+        return self.color
+
+    def __repr__(self):
+        return f'BitCellView(x={self.x}, y={self.y}, value={self.value})'
+
+
+class BitGrid:
+    view_class = BitCellView
+
+    def __init__(self, matrix):
+        self.words = pack(matrix)
+        self.rows, self.cols = np.shape(matrix)
+        self.palette = BIT_PALETTE
+        self.grid = [RowView(self, x) for x in range(self.rows)]
+        # Flat index arrays of cells changed since the last pop_dirty();
+        # None means every cell
+        self._dirty = None
+
+    # Wrap already packed words without copying them
+    @classmethod
+    def from_words(cls, words, cols):
+        grid = cls.__new__(cls)
+        grid.rows, grid.cols = words.shape[0], cols
+        grid.words = words
+        grid.palette = BIT_PALETTE
+        grid.grid = [RowView(grid, x) for x in range(grid.rows)]
+        grid._dirty = None
+        return grid
+
+    # Grid from a string of '0' / '1' characters (whitespace ignored) in
+    # row-major order; without a shape the string must be a perfect square
+    @classmethod
+    def from_bitstring(cls, text, rows=None, cols=None):
+        if isinstance(text, str):
+            text = text.encode('ascii')
+        chars = np.frombuffer(b''.join(text.split()), dtype=np.uint8)
+        if rows is None and cols is None:
+            rows = cols = math.isqrt(len(chars))
+        elif rows is None:
+            rows = len(chars) // cols
+        elif cols is None:
+            cols = len(chars) // rows
+        if rows * cols != len(chars):
+            raise ValueError(f'{len(chars)} cells do not fill a {rows}x{cols} grid')
+        bits = chars - ord('0')
+        if bits.size and bits.max() > 1:
+            raise ValueError('bitstring may only contain 0 and 1')
+        return cls(bits.reshape(rows, cols))
+
+    def to_bitstring(self):
+        return (unpack(self.words, self.cols) + ord('0')).tobytes().decode('ascii')
+
+    def to_array(self):
+        return unpack(self.words, self.cols)
+
+    @property
+    def size(self):
+        return self.rows * self.cols
+
+    @property
+    def nbytes(self):
+        return self.words.nbytes
+
+    def get_value(self, x, y):
+        return int(self.words[x, y >> 6] >> np.uint64(y & 63) & ONE)
+
+    def set_value(self, x, y, value):
+        bit = ONE << np.uint64(y & 63)
+        if value:
+            self.words[x, y >> 6] |= bit
+        else:
+            self.words[x, y >> 6] &= ~bit
+        self.mark_dirty(x * self.cols + y)
+
+    def mark_dirty(self, indices):
+        if self._dirty is not None:
+            self._dirty.append(np.asarray(indices, dtype=np.int64).ravel())
+
+    # Flat indices of the cells changed since the last call, or None if every
+    # cell may have changed
+    def pop_dirty(self):
+        dirty, self._dirty = self._dirty, []
+        if dirty is None:
+            return None
+        if not dirty:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(dirty))
+
+    # Number of 1 cells
+    def popcount(self):
+        return popcount(self.words)
+
+    def _check_shape(self, other):
+        if (self.rows, self.cols) != (other.rows, other.cols):
+            raise ValueError('bit grids must have the same shape')
+
+    def __and__(self, other):
+        self._check_shape(other)
+        return BitGrid.from_words(self.words & other.words, self.cols)
+
+    def __or__(self, other):
+        self._check_shape(other)
+        return BitGrid.from_words(self.words | other.words, self.cols)
+
+    def __xor__(self, other):
+        self._check_shape(other)
+        return BitGrid.from_words(self.words ^ other.words, self.cols)
+
+    def __invert__(self):
+        words = ~self.words
+        self._clear_padding(words)
+        return BitGrid.from_words(words, self.cols)
+
+    def __eq__(self, other):
+        if not isinstance(other, BitGrid):
+            return NotImplemented
+        return (self.rows, self.cols) == (other.rows, other.cols) and \
+            np.array_equal(self.words, other.words)
+
+    __hash__ = None
+
+    def _clear_padding(self, words):
+        if self.cols % 64:
+            words[:, -1] &= (ONE << np.uint64(self.cols % 64)) - ONE
+
+    # Bit-sliced neighbor counts of rows [r0, r1): four planes of words,
+    # least significant bit first
+    def _neighbor_counter(self, r0, r1):
+        width = self.words.shape[1]
+        # Rows r0 - 1 .. r1 with zero rows past the edges
+        band = np.zeros((r1 - r0 + 2, width), dtype=np.uint64)
+        lo, hi = max(r0 - 1, 0), min(r1 + 1, self.rows)
+        band[lo - r0 + 1:hi - r0 + 1] = self.words[lo:hi]
+        # west[y] = band[y - 1] and east[y] = band[y + 1], carrying bits
+        # across word boundaries
+        west = band << ONE
+        west[:, 1:] |= band[:, :-1] >> TOP_BIT
+        self._clear_padding(west)
+        east = band >> ONE
+        east[:, :-1] |= band[:, 1:] << TOP_BIT
+        counter = [np.zeros((r1 - r0, width), dtype=np.uint64) for _ in range(4)]
+        for plane in (west, band, east):
+            _count_into(counter, plane[:-2])
+            _count_into(counter, plane[2:])
+        _count_into(counter, west[1:-1])
+        _count_into(counter, east[1:-1])
+        return counter
+
+    def _bands(self):
+        step = max(1, BAND_BYTES // max(self.words.shape[1] * 8, 1))
+        for r0 in range(0, self.rows, step):
+            yield r0, min(r0 + step, self.rows)
+
+    # Number of 1 neighbors (0-8) of every cell, as a (rows, cols) uint8 array
+    def neighbor_counts(self):
+        counts = np.zeros((self.rows, self.cols), dtype=np.uint8)
+        for r0, r1 in self._bands():
+            for k, plane in enumerate(self._neighbor_counter(r0, r1)):
+                counts[r0:r1] |= unpack(plane, self.cols) << k
+        return counts
+
+    # One synchronous update: a 0 cell becomes 1 when its neighbor count is
+    # in `born`, a 1 cell stays 1 when it is in `survive` (see MAJORITY, LIFE)
+    def step(self, born=MAJORITY['born'], survive=MAJORITY['survive']):
+        new = np.empty_like(self.words)
+        for r0, r1 in self._bands():
+            counter = self._neighbor_counter(r0, r1)
+            current = self.words[r0:r1]
+            new[r0:r1] = (~current & _count_is(counter, born)) | \
+                (current & _count_is(counter, survive))
+        self._clear_padding(new)
+        self.words = new
+        self._dirty = None
+
+    def run(self, steps, born=MAJORITY['born'], survive=MAJORITY['survive']):
+        for _ in range(steps):
+            self.step(born, survive)
+
+    # Bits of the cells at rows x cols (index arrays)
+    def _bits(self, rows, cols):
+        rows, cols = np.asarray(rows), np.asarray(cols)
+        words = self.words[rows, cols >> 6]
+        return (words >> (cols & 63).astype(np.uint64) & ONE).astype(np.uint8)
+
+    # Color of every cell in row-major order, or of the given flat indices
+    def colors(self, indices=None):
+        hex_colors = self.palette.hex
+        if indices is None:
+            bits = self.to_array().ravel()
+        else:
+            bits = self._bits(*np.divmod(np.asarray(indices), self.cols))
+        return [hex_colors[i] for i in bits.tolist()]
+
+    # (rows, cols, 3) uint8 RGB buffer for rendering, optionally of a
+    # (x0, x1, y0, y1) sub-grid
+    def rgb(self, region=None):
+        if region is None:
+            return self.palette.rgb[self.to_array()]
+        x0, x1, y0, y1 = region
+        w0, w1 = y0 >> 6, words_per_row(y1)
+        bits = unpack(self.words[x0:x1, w0:w1], (w1 - w0) * 64)
+        return self.palette.rgb[bits[:, y0 - w0 * 64:y1 - w0 * 64]]
+
+    # RGB of the cells at rows x cols (index arrays), for sampled rendering
+    def rgb_sample(self, rows, cols):
+        return self.palette.rgb[self._bits(np.asarray(rows)[:, None], np.asarray(cols)[None, :])]
+
+    # Straight from the population count
+    def average_color(self):
+        if self.size == 0:
+            return '#000000'
+        ones = self.popcount()
+        counts = np.array([self.size - ones, ones], dtype=np.int64)
+        avg_r, avg_g, avg_b = (int(total / self.size)
+                               for total in (counts @ self.palette.rgb.astype(np.int64)).tolist())
+        return f'#{avg_r:02x}{avg_g:02x}{avg_b:02x}'
+
+
+# BitGrid from a file holding a bitstring such as candice.txt
+def load_bitstring(path, rows=None, cols=None):
+    with open(path, 'rb') as f:
+        return BitGrid.from_bitstring(f.read(), rows, cols)
@@ -0,0 +1,38 @@
+from collections import deque
+
+import numpy as np
+
+# Bounded log of which cells changed at each grid version, in the spirit of
+# server.ts's CellObserver. A grid records every change as it happens; readers
+# ask for the cells changed since a version they already have, and fall back
+# to a full snapshot once that version has been evicted.
+
+
+class ChangeLog:
+    def __init__(self, maxlen=1024):
+        # (version, flat indices) pairs; indices of None means every cell
+        self.entries = deque(maxlen=maxlen)
+
+    def record(self, version, indices):
+        self.entries.append((version, indices))
+
+    # Sorted flat indices changed after `version` up to `current`, or None
+    # when the log cannot answer (too old, unknown, or a whole-grid change in
+    # between). Safe to call while another thread records: it works on a copy
+    # and ignores anything newer than `current`.
+    def since(self, version, current):
+        if version == current:
+            return np.empty(0, dtype=np.int64)
+        entries = tuple(self.entries)
+        if version > current or not entries or entries[0][0] > version + 1:
+            return None
+        changed = []
+        for entry_version, indices in entries:
+            if entry_version <= version or entry_version > current:
+                continue
+            if indices is None:
+                return None
+            changed.append(np.asarray(indices, dtype=np.int64).ravel())
+        if not changed:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(changed))
@@ -0,0 +1,69 @@
+import threading
+import time
+from collections import Counter
+from concurrent.futures import Future
+
+# Folding queued effects into as few grid passes as possible. Resonance is a
+# uniform shift mod 10 and spirals add to disjoint-or-overlapping disks, so
+# both commute and can be combined before touching the grid.
+
+
+# A run of resonance frequencies is one shift by their sum
+def combine_frequencies(frequencies):
+    return sum(int(frequency) for frequency in frequencies) % 10
+
+
+# Spiral clicks grouped by (x_center, y_center, spiral_power) with how many
+# times each was clicked; apply each once with repeat=count
+def merge_spirals(clicks):
+    return sorted(Counter(tuple(click) for click in clicks).items())
+
+
+# Server effects are tuples: ('resonance', frequency) or ('set', row, col,
+# value). Consecutive resonances fold into one shift and shifts that cancel
+# out are dropped; a set keeps its place, since it does not commute with the
+# shifts around it.
+def compose_effects(effects):
+    passes, shift = [], []
+    for effect in effects:
+        if effect[0] == 'resonance':
+            shift.append(effect[1])
+            continue
+        if combine_frequencies(shift):
+            passes.append(('resonance', combine_frequencies(shift)))
+        shift = []
+        passes.append(tuple(effect))
+    if combine_frequencies(shift):
+        passes.append(('resonance', combine_frequencies(shift)))
+    return passes
+
+
+# Collects effects submitted from many request threads within `window`
+# seconds and hands them to apply_batch(effects) as one batch. The first
+# submitter of a batch waits out the window and applies it; everyone in the
+# batch gets apply_batch's return value.
+class ClickCoalescer:
+    def __init__(self, apply_batch, window=0.005):
+        self.apply_batch = apply_batch
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = []
+        self._batch = None
+
+    def submit(self, effects):
+        with self._lock:
+            self._pending.extend(effects)
+            batch, leader = self._batch, self._batch is None
+            if leader:
+                batch = self._batch = Future()
+        if not leader:
+            return batch.result()
+        time.sleep(self.window)
+        with self._lock:
+            effects, self._pending = self._pending, []
+            self._batch = None
+        try:
+            batch.set_result(self.apply_batch(effects))
+        except Exception as error:
+            batch.set_exception(error)
+        return batch.result()
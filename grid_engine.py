@@ -0,0 +1,405 @@
+import numpy as np
+
+from palette import resonance_palette
+from region_stats import BlockSums, describe
+
+# Array-backed storage for the resonance grids. Values live in one contiguous
+# integer array so resonance is a single vectorized operation; the familiar
+# grid[x][y] / Cell access is kept through thin views over that array.
+#
+# With lazy=True resonance is not applied to the array at all: the engine only
+# accumulates a pending shift and every read adds it on the fly. materialize()
+# folds the shift into the array and must run before any non-uniform effect.
+#
+# snapshot() freezes the current state for readers on other threads. The
+# values array is shared with the snapshot and marked read-only, and the
+# engine copies it before its next in-place write, so a lazy resonance (which
+# only moves the shift) never copies anything.
+#
+# region_stats() answers statistics of any rectangle from block prefix sums
+# (region_stats.BlockSums) of each cell's palette bucket (value % 10), kept as
+# int32 counts, and of its value and squared value. A pending shift only
+# rotates the buckets, so lazy resonance leaves the sums valid; set_value
+# updates them in place, and eager whole-grid changes drop them until the
+# next query rebuilds them. Snapshots share the sums the way they share the
+# values array, except that the engine copies only the strips it writes.
+
+
+BUCKETS = np.arange(10)
+
+
+# BlockSums channels: one-hot palette bucket of the stored value
+def bucket_channels(values, x0, x1, y0, y1):
+    return (values[x0:x1, y0:y1, None] % 10 == BUCKETS).astype(np.int32)
+
+
+# BlockSums channels: the stored value and its square
+def moment_channels(values, x0, x1, y0, y1):
+    box = values[x0:x1, y0:y1].astype(np.int64)
+    return np.stack([box, box * box], axis=-1)
+
+
+# (bucket counts, value moments) sums for region_stats()
+def region_sums(values):
+    count_type = np.int32 if values.size < 2 ** 31 else np.int64
+    return [BlockSums(values, bucket_channels, count_type),
+            BlockSums(values, moment_channels, np.int64)]
+
+
+# View onto a single cell; reads and writes go straight to the engine's array
+class CellView:
+    __slots__ = ('_engine', 'x', 'y')
+
+    def __init__(self, engine, x, y):
+        self._engine = engine
+        self.x = x
+        self.y = y
+
+    @property
+    def index(self):
+        return self.x * self._engine.cols + self.y
+
+    @property
+    def value(self):
+        return self._engine.get_value(self.x, self.y)
+
+    @value.setter
+    def value(self, new_value):
+        self._engine.set_value(self.x, self.y, new_value)
+
+    @property
+    def color(self):
+        return self._engine.color_at(self.x, self.y)
+
+    @property
+    def schema(self):
+        return self._engine.schema
+
+    @property
+    def machine_set(self):
+        return self._engine.machine_set
+
+    @property
+    def id(self):
+        if self._engine.id_fn is None:
+            raise AttributeError('cells of this grid have no id')
+        return self._engine.id_fn(self.index)
+
+    def calculate_color(self):
+        return self.color
+
+    def set_value(self, new_value):
+        self.value = new_value
+
+    def __repr__(self):
+        return f'CellView(x={self.x}, y={self.y}, value={self.value})'
+
+
+# View onto one row so grid[x][y] keeps working
+class RowView:
+    __slots__ = ('_engine', 'x')
+
+    def __init__(self, engine, x):
+        self._engine = engine
+        self.x = x
+
+    def __len__(self):
+        return self._engine.cols
+
+    def __getitem__(self, y):
+        if isinstance(y, slice):
+            return [self[i] for i in range(*y.indices(self._engine.cols))]
+        if y < 0:
+            y += self._engine.cols
+        if not 0 <= y < self._engine.cols:
+            raise IndexError('cell index out of range')
+        return self._engine.view_class(self._engine, self.x, y)
+
+    def __iter__(self):
+        view_class = self._engine.view_class
+        for y in range(self._engine.cols):
+            yield view_class(self._engine, self.x, y)
+
+
+# Read side shared by the live engine and its snapshots: everything here
+# only looks at values, _shift, palette, counts and _rgb_totals.
+class GridState:
+    @property
+    def size(self):
+        return self.rows * self.cols
+
+    def get_value(self, x, y):
+        if self._shift is None:
+            return int(self.values[x, y])
+        return int(self.values[x, y] + self._shift) % 10
+
+    def color_at(self, x, y):
+        return self.palette.hex[self.get_value(x, y) % 10]
+
+    # Current values with any pending shift applied, without folding it in,
+    # optionally of a (x0, x1, y0, y1) sub-grid
+    def current_values(self, region=None):
+        values = self.values
+        if region is not None:
+            x0, x1, y0, y1 = region
+            values = values[x0:x1, y0:y1]
+        if self._shift is None:
+            return values.copy()
+        return (values + self._shift) % 10
+
+    # Palette index of every cell, or of a (x0, x1, y0, y1) sub-grid
+    def color_indices(self, region=None):
+        values = self.values
+        if region is not None:
+            x0, x1, y0, y1 = region
+            values = values[x0:x1, y0:y1]
+        if self._shift is None:
+            return values % 10
+        return (values + self._shift) % 10
+
+    # Color of every cell in row-major order, or of the given flat indices;
+    # with indices only those cells are read, so a few changed cells cost
+    # the same on any grid size
+    def colors(self, indices=None):
+        hex_colors = self.palette.hex
+        if indices is None:
+            color_indices = self.color_indices().ravel()
+        else:
+            values = self.values.take(indices)
+            if self._shift is not None:
+                values = values + self._shift
+            color_indices = values % 10
+        return [hex_colors[i] for i in color_indices.tolist()]
+
+    # (rows, cols, 3) uint8 RGB buffer for rendering, optionally of a
+    # (x0, x1, y0, y1) sub-grid
+    def rgb(self, region=None):
+        return self.palette.rgb[self.color_indices(region)]
+
+    # RGB of the cells at rows x cols (index arrays), for sampled rendering
+    def rgb_sample(self, rows, cols):
+        values = self.values[np.ix_(rows, cols)]
+        if self._shift is not None:
+            values = values + self._shift
+        return self.palette.rgb[values % 10]
+
+    # Constant time: read straight from the running RGB totals
+    def average_rgb(self):
+        if self.size == 0:
+            return 0, 0, 0
+        return tuple(int(total / self.size) for total in self._rgb_totals)
+
+    def average_color(self):
+        avg_r, avg_g, avg_b = self.average_rgb()
+        return f'#{avg_r:02x}{avg_g:02x}{avg_b:02x}'
+
+    # Count, value mean / std, average color and color histogram of a
+    # (x0, x1, y0, y1) region, or of the whole grid, in constant time
+    def region_stats(self, region=None):
+        x0, x1, y0, y1 = region if region is not None else (0, self.rows, 0, self.cols)
+        if self._sums is None:
+            self._sums = region_sums(self.values)
+        counts = self._sums[0].sum(self.values, x0, x1, y0, y1).tolist()
+        if self._shift is None:
+            value_sum, square_sum = self._sums[1].sum(self.values, x0, x1, y0, y1).tolist()
+        else:
+            # Stored bucket b shows as color (b + shift) % 10, which is also
+            # the current value
+            counts = counts[-self._shift:] + counts[:-self._shift]
+            value_sum = sum(c * n for c, n in enumerate(counts))
+            square_sum = sum(c * c * n for c, n in enumerate(counts))
+        rgb_totals = (np.array(counts, dtype=np.int64) @ self.palette.rgb.astype(np.int64)).tolist()
+        stats = describe((x1 - x0) * (y1 - y0), rgb_totals, value_sum, square_sum)
+        stats['histogram'] = counts
+        return stats
+
+
+# Immutable view of an engine at one version. Readers may use it from any
+# thread without locking; `cache` holds serializations of this version.
+class GridSnapshot(GridState):
+    def __init__(self, engine):
+        self.values = engine.values
+        self.rows, self.cols = engine.rows, engine.cols
+        self.schema = engine.schema
+        self.machine_set = engine.machine_set
+        self.palette = engine.palette
+        self._shift = engine._shift
+        self.counts = engine.counts.copy()
+        self._rgb_totals = list(engine._rgb_totals)
+        self.version = engine.version
+        self._sums = engine._sums
+        self.cache = {}
+
+
+class GridEngine(GridState):
+    def __init__(self, matrix, schema='default_schema', machine_set='default_set',
+                 view_class=CellView, id_fn=None, lazy=False):
+        self.values = np.array(matrix, dtype=np.int32)
+        if self.values.ndim != 2:
+            raise ValueError('grid matrix must be two-dimensional')
+        self.rows, self.cols = self.values.shape
+        self.schema = schema
+        self.machine_set = machine_set
+        self.palette = resonance_palette(schema, machine_set)
+        self.view_class = view_class
+        self.id_fn = id_fn
+        self.lazy = lazy
+        # Pending resonance shift in lazy mode; None means the array is current
+        self._shift = None
+        # Cells changed since the last pop_dirty(); None means every cell
+        self._dirty = None
+        # Bumped by every change to the grid's contents
+        self.version = 0
+        # Optional change_log.ChangeLog told about every versioned change
+        self.change_log = None
+        # Optional history.History recording every versioned change
+        self.history = None
+        # region_stats() [bucket counts, value moments] BlockSums, built on
+        # first use
+        self._sums = None
+        self.grid = [RowView(self, x) for x in range(self.rows)]
+        self._recount()
+
+    # Rebuild the per-color histogram and RGB totals from the values array.
+    # Everything else keeps them current incrementally, so writes must go
+    # through set_value / apply_resonance rather than poking self.values.
+    def _recount(self):
+        self.counts = np.bincount(self.color_indices().ravel(), minlength=10)
+        self._update_totals()
+
+    def _update_totals(self):
+        self._rgb_totals = (self.counts @ self.palette.rgb.astype(np.int64)).tolist()
+
+    # Replace the whole state at once, e.g. with one read from a
+    # shared_store.SharedGridStore that other processes write to
+    def load(self, values, shift, version):
+        self.values = values
+        self._shift = shift
+        self.version = version
+        self._dirty = None
+        self._sums = None
+        self._recount()
+        if self.change_log is not None:
+            self.change_log.record(version, None)
+        if self.history is not None:
+            self.history.record(self, 'load')
+
+    # The state a history.History checkpoints: the values array, shared and
+    # therefore frozen, and the pending shift (-1 for none)
+    def history_state(self):
+        self.values.setflags(write=False)
+        return {'values': self.values, 'shift': -1 if self._shift is None else self._shift}
+
+    # Load a history_state() as `version`
+    def load_history_state(self, state, version):
+        values, shift = state['values'], int(state['shift'])
+        shift = None if shift < 0 else shift
+        if shift is not None and not self.lazy:
+            values, shift = (np.asarray(values) + shift) % 10, None
+        self.load(values, shift, version)
+
+    # Scratch engine in a history_state(), for replaying records onto
+    @classmethod
+    def from_history_state(cls, state):
+        engine = cls(state['values'], lazy=True)
+        shift = int(state['shift'])
+        engine._shift = None if shift < 0 else shift
+        return engine
+
+    # Copy-on-write: the values array may be shared with a snapshot
+    def _own_values(self):
+        if not self.values.flags.writeable:
+            self.values = self.values.copy()
+
+    def snapshot(self):
+        self.values.setflags(write=False)
+        snapshot = GridSnapshot(self)
+        if self._sums is not None:
+            self.share_region_sums()
+        return snapshot
+
+    # Region sums for a reader of the current version, built if need be:
+    # they are frozen, and the engine keeps copies of them that copy each
+    # strip before writing to it
+    def share_region_sums(self):
+        if self._sums is None:
+            self._sums = region_sums(self.values)
+        shared = self._sums
+        for sums in shared:
+            sums.freeze()
+        self._sums = [sums.copy() for sums in shared]
+        return shared
+
+    # Move the region sums from stored value `old` to `new` at (x, y)
+    def _update_sums(self, x, y, old, new):
+        cell = np.array([[old, new]])
+        for sums in self._sums:
+            before, after = sums.channels(cell, 0, 1, 0, 2)[0]
+            sums.add(x, y, (after.astype(np.int64) - before)[None, None])
+
+    def set_value(self, x, y, value):
+        old = self.get_value(x, y) % 10
+        if self._shift is not None and not 0 <= value < 10:
+            self.materialize()
+        self._own_values()
+        stored = int(self.values[x, y])
+        if self._shift is None:
+            self.values[x, y] = value
+        else:
+            # Store the value the pending shift will turn back into `value`
+            self.values[x, y] = (value - self._shift) % 10
+        if self._sums is not None:
+            self._update_sums(x, y, stored, int(self.values[x, y]))
+        new = value % 10
+        self.version += 1
+        if self.change_log is not None:
+            self.change_log.record(self.version, (x * self.cols + y,))
+        if self.history is not None:
+            self.history.record(self, 'set', x, y, value)
+        if self._dirty is not None:
+            self._dirty.add(x * self.cols + y)
+        if old != new:
+            self.counts[old] -= 1
+            self.counts[new] += 1
+            old_rgb, new_rgb = self.palette.rgb[old].tolist(), self.palette.rgb[new].tolist()
+            for channel in range(3):
+                self._rgb_totals[channel] += new_rgb[channel] - old_rgb[channel]
+
+    # Shift every cell by the frequency in one pass over the array. Shifting
+    # every value by the same amount just rotates the color histogram.
+    def apply_resonance(self, frequency):
+        frequency = int(frequency)
+        if self.lazy:
+            self._shift = ((self._shift or 0) + frequency) % 10
+        else:
+            self._own_values()
+            np.add(self.values, frequency, out=self.values)
+            np.remainder(self.values, 10, out=self.values)
+            self._sums = None
+        self.counts = np.roll(self.counts, frequency % 10)
+        self._update_totals()
+        self.version += 1
+        if self.change_log is not None:
+            self.change_log.record(self.version, None)
+        if self.history is not None:
+            self.history.record(self, 'resonance', frequency)
+        if frequency % 10:
+            self._dirty = None
+
+    # Fold a pending lazy shift into the values array
+    def materialize(self):
+        if self._shift is not None:
+            self._own_values()
+            np.add(self.values, self._shift, out=self.values)
+            np.remainder(self.values, 10, out=self.values)
+            self._shift = None
+            self._sums = None
+
+    # Flat indices of the cells changed since the last call, or None if every
+    # cell may have changed. Used by renderers to repaint only what moved.
+    def pop_dirty(self):
+        dirty, self._dirty = self._dirty, set()
+        if dirty is None:
+            return None
+        return np.fromiter(sorted(dirty), dtype=np.int64, count=len(dirty))
+
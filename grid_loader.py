@@ -0,0 +1,83 @@
+import os
+import struct
+
+import numpy as np
+
+# Loading grid matrices like a.csv without importing pandas.
+#
+# The first load parses the CSV with numpy and writes a binary sidecar next to
+# it (a.csv -> a.csv.grid): a small header recording the CSV's size and mtime,
+# then the values as raw int64. Later loads whose CSV still matches the header
+# just memory-map the sidecar. pandas is only imported for CSVs numpy cannot
+# parse as a plain integer matrix (missing fields, quoting, floats).
+
+MAGIC = b'SGRDCSV1'
+# magic, csv size, csv mtime (ns), rows, cols
+HEADER = struct.Struct('<8sqqII')
+SUFFIX = '.grid'
+
+
+def cache_path(path):
+    return os.fspath(path) + SUFFIX
+
+
+# (rows, cols) int64 matrix for a header-less CSV of integers. The result is
+# a read-only memory map when it came from the sidecar; every grid class
+# copies its input, so callers never need to.
+def load_grid(path, use_cache=True):
+    stat = os.stat(path)
+    if use_cache:
+        values = read_cache(cache_path(path), stat)
+        if values is not None:
+            return values
+    values = parse_csv(path)
+    if use_cache:
+        write_cache(cache_path(path), stat, values)
+    return values
+
+
+def parse_csv(path):
+    try:
+        values = np.loadtxt(path, delimiter=',', dtype=np.int64, ndmin=2)
+    except ValueError:
+        # Ragged rows or non-integer fields: fall back to what the entry
+        # points used to do
+        import pandas as pd
+        values = pd.read_csv(path, header=None).values
+    return values
+
+
+def read_cache(path, stat):
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(HEADER.size)
+    except OSError:
+        return None
+    if len(header) != HEADER.size:
+        return None
+    magic, size, mtime_ns, rows, cols = HEADER.unpack(header)
+    if magic != MAGIC or size != stat.st_size or mtime_ns != stat.st_mtime_ns:
+        return None
+    if os.path.getsize(path) != HEADER.size + rows * cols * 8:
+        return None
+    if rows * cols == 0:
+        return np.zeros((rows, cols), dtype=np.int64)
+    return np.memmap(path, dtype='<i8', mode='r', offset=HEADER.size, shape=(rows, cols))
+
+
+# Best effort: an unwritable directory or a non-integer matrix just means
+# the next start parses the CSV again
+def write_cache(path, stat, values):
+    if values.dtype.kind not in 'iu' or values.ndim != 2:
+        return
+    tmp = f'{path}.{os.getpid()}.tmp'
+    try:
+        with open(tmp, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, stat.st_size, stat.st_mtime_ns, *values.shape))
+            f.write(np.ascontiguousarray(values, dtype='<i8').tobytes())
+        os.replace(tmp, path)
+    except OSError:
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
@@ -0,0 +1,352 @@
+import json
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from change_log import ChangeLog
+from coalesce import compose_effects
+import wire
+from grid_engine import GridEngine
+from palette import resonance_palette
+
+# Grid serving shared by the Flask app (server.py) and the asyncio one
+# (server_async.py): cell ids, the snapshot-publishing GridManager, request
+# effect parsing and the /grid encoders. Nothing here knows about a web
+# framework.
+
+class Ulid:  # A simple ULID generator
+    def __init__(self):
+        self.counter = 0
+
+    def new(self):
+        self.counter += 1
+        return self.format(self.counter)
+
+    # Reserve a block of ids up front; returns the counter value before the block
+    def reserve(self, count):
+        base = self.counter
+        self.counter += count
+        return base
+
+    def format(self, counter):
+        return f"00000000-0000-0000-0000-{counter:012x}"
+
+    # Inverse of format; None if the string is not one of our ids
+    def parse(self, value):
+        prefix, _, counter = value.rpartition('-')
+        if prefix != "00000000-0000-0000-0000" or len(counter) != 12:
+            return None
+        try:
+            return int(counter, 16)
+        except ValueError:
+            return None
+
+ulid = Ulid()
+
+class Cell:
+    def __init__(self, value):
+        self.id = ulid.new()
+        self.value = value
+        self.color = self.calculate_color()
+
+    def calculate_color(self):
+        return resonance_palette().hex[self.value % 10]
+
+    def set_value(self, new_value):
+        self.value = new_value
+        self.color = self.calculate_color()
+
+class GridManager:
+    # How often streams look for writes made by other processes
+    STORE_POLL = 0.05
+
+    # With lazy=True a click only bumps the engine's pending shift. With a
+    # shared_store.SharedGridStore the store is the authoritative state and
+    # this manager a cache of it that catches up whenever the store's version
+    # moves, so several worker processes can serve one grid. A
+    # history.History records every change for undo() / seek() and, with a
+    # directory, restores the grid saved by a previous run.
+    def __init__(self, matrix, lazy=False, store=None, history=None):
+        if store is not None and history is not None:
+            raise ValueError('a shared store and a history cannot be combined')
+        self.engine = GridEngine(matrix, id_fn=self.cell_id, lazy=lazy)
+        self.id_base = ulid.reserve(self.engine.size)
+        self.grid = self.engine.grid
+        # Distinguishes this process's versions from a previous run's in ETags
+        self.instance = uuid.uuid4().hex[:8] if store is None else store.token[:8]
+        self.changes = ChangeLog()
+        self.engine.change_log = self.changes
+        self.history = history
+        if history is not None:
+            history.attach(self.engine)
+        # Held for every write and notified after it, so streams can wait on it
+        self.updated = threading.Condition()
+        # Readers never take the lock: writers build the next state and
+        # publish it here as an immutable GridSnapshot with one assignment, so
+        # a reader always sees one whole version however writes interleave
+        self.snapshot = self.engine.snapshot()
+        self.store = store
+        if store is not None:
+            with self.updated, store.locked():
+                self.engine.load(*store.read())
+                self._publish()
+
+    @property
+    def version(self):
+        return self.current().version
+
+    # The snapshot to read from; with a shared store, first catch up with
+    # writes from other processes
+    def current(self):
+        if self.store is not None and self.store.version != self.snapshot.version:
+            with self.updated:
+                self._load_store()
+        return self.snapshot
+
+    # Called with self.updated held
+    def _load_store(self):
+        with self.store.locked():
+            if self.store.version != self.engine.version:
+                self.engine.load(*self.store.read())
+                self._publish()
+
+    def etag(self, version):
+        return f'{self.instance}-{version}'
+
+    # Serialized state for the current version; encode(manager, snapshot)
+    # runs about once per version and format (two readers racing on a new
+    # version may both encode it). Returns (version, data).
+    def serialized(self, fmt, encode):
+        snapshot = self.current()
+        data = snapshot.cache.get(fmt)
+        if data is None:
+            data = snapshot.cache[fmt] = encode(self, snapshot)
+        return snapshot.version, data
+
+    # Cells are addressed by (row, col) / flat index; ids are derived from the
+    # position only when asked for, in the row-major order Cell() used
+    def cell_id(self, index):
+        return ulid.format(self.id_base + index + 1)
+
+    # Flat index for a cell id, or None if it is not one of this grid's
+    def cell_index(self, cell_id):
+        counter = ulid.parse(cell_id)
+        if counter is None or not 0 < counter - self.id_base <= self.engine.size:
+            return None
+        return counter - self.id_base - 1
+
+    def get_cell(self, row, col):
+        snapshot = self.current()
+        return {
+            'row': row,
+            'col': col,
+            'id': self.cell_id(row * snapshot.cols + col),
+            'value': snapshot.get_value(row, col),
+            'color': snapshot.color_at(row, col),
+            'version': snapshot.version
+        }
+
+    # Values and colors of rows [r0, r1) x cols [c0, c1)
+    def get_region(self, r0, c0, r1, c1):
+        snapshot = self.current()
+        values = snapshot.current_values((r0, r1, c0, c1))
+        hex_colors = snapshot.palette.hex
+        colors = [[hex_colors[i] for i in row] for row in (values % 10).tolist()]
+        return {
+            'r0': r0, 'c0': c0, 'r1': r1, 'c1': c1,
+            'values': values.tolist(),
+            'colors': colors,
+            'version': snapshot.version
+        }
+
+    # Count, value mean / std, average color and color histogram of rows
+    # [r0, r1) x cols [c0, c1), in constant time
+    def get_region_stats(self, r0, c0, r1, c1):
+        snapshot = self.current()
+        if snapshot._sums is None:
+            # Build the sums once, on the engine, which keeps them current
+            # from then on and hands them to every snapshot it publishes
+            with self.updated:
+                snapshot = self.snapshot
+                if snapshot._sums is None:
+                    snapshot._sums = self.engine.share_region_sums()
+        stats = snapshot.region_stats((r0, r1, c0, c1))
+        stats.update({'r0': r0, 'c0': c0, 'r1': r1, 'c1': c1, 'version': snapshot.version})
+        return stats
+
+    # Called with self.updated held after every write
+    def _publish(self):
+        self.snapshot = self.engine.snapshot()
+        self.updated.notify_all()
+
+    # Every write runs inside this. It holds the write lock (and the shared
+    # store's, after catching up with it), then publishes a snapshot and
+    # writes the result back to the store if anything changed.
+    @contextmanager
+    def _writing(self):
+        with self.updated:
+            if self.store is None:
+                yield
+                if self.engine.version != self.snapshot.version:
+                    self._publish()
+                return
+            with self.store.locked():
+                self._load_store()
+                values = self.engine.values
+                yield
+                if self.engine.version != self.snapshot.version:
+                    # values is frozen by the last snapshot, so any write to
+                    # it made a copy; the same array means only the shift moved
+                    changed = None if self.engine.values is values else self.engine.values
+                    self.store.write(changed, self.engine._shift, self.engine.version)
+                    self._publish()
+
+    def apply_resonance(self, frequency):
+        with self._writing():
+            self.engine.apply_resonance(frequency)
+
+    def set_value(self, row, col, value):
+        with self._writing():
+            self.engine.set_value(row, col, value)
+
+    # Apply a list of effects (see coalesce.compose_effects) as few passes
+    # and publish once; returns the resulting version
+    def apply_batch(self, effects):
+        with self._writing():
+            for effect in compose_effects(effects):
+                if effect[0] == 'resonance':
+                    self.engine.apply_resonance(effect[1])
+                else:
+                    self.engine.set_value(*effect[1:])
+            return self.engine.version
+
+    # Go back to the state before the latest change, as a new version;
+    # returns that version. ValueError when there is nothing to undo.
+    def undo(self):
+        with self._writing():
+            return self.history.undo(self.engine)
+
+    # Load the state the grid had at `version`, as a new version; returns
+    # that version. ValueError when the history does not reach it.
+    def seek(self, version):
+        with self._writing():
+            return self.history.seek(self.engine, version)
+
+    # Block until the grid moves past `version` or the timeout expires;
+    # returns whether it changed. Other processes cannot notify us, so with
+    # a shared store this polls its version every STORE_POLL seconds.
+    def wait_for_change(self, version, timeout=None):
+        if self.store is None:
+            with self.updated:
+                return self.updated.wait_for(lambda: self.version != version, timeout)
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.version == version:
+            wait = self.STORE_POLL
+            if deadline is not None:
+                wait = min(wait, deadline - time.monotonic())
+                if wait <= 0:
+                    return False
+            with self.updated:
+                self.updated.wait(wait)
+        return True
+
+    # Cells changed since `since`, or the whole grid (full=True) when the
+    # change log no longer reaches back that far
+    def get_changes(self, since):
+        snapshot = self.current()
+        indices = self.changes.since(since, snapshot.version)
+        if indices is None:
+            color_codes, average_color = self.get_grid_state(snapshot)
+        else:
+            ids = [self.cell_id(i) for i in indices.tolist()]
+            color_codes = dict(zip(ids, snapshot.colors(indices)))
+            average_color = snapshot.average_color()
+        return {
+            'version': snapshot.version,
+            'since': since,
+            'full': indices is None,
+            'color_codes': color_codes,
+            'average_color': average_color
+        }
+
+    def get_grid_state(self, snapshot=None):
+        if snapshot is None:
+            snapshot = self.current()
+        ids = map(self.cell_id, range(snapshot.size))
+        color_codes = dict(zip(ids, snapshot.colors()))
+        average_color = snapshot.average_color()
+        return color_codes, average_color
+
+    def calculate_average_color(self, cells):
+        num_cells = len(cells)
+        if num_cells == 0:
+            return '#000000'
+        rgb = resonance_palette().rgb.tolist()
+        total_r = total_g = total_b = 0
+        for cell in cells:
+            r, g, b = rgb[cell.value % 10]
+            total_r += r
+            total_g += g
+            total_b += b
+        avg_r = int(total_r / num_cells)
+        avg_g = int(total_g / num_cells)
+        avg_b = int(total_b / num_cells)
+        return f'#{avg_r:02x}{avg_g:02x}{avg_b:02x}'
+
+# Frequencies are folded mod 10 but still logged as given, so they are kept
+# within int32
+MAX_FREQUENCY = 2**31 - 1
+
+# A JSON integer (not a bool) with low <= value <= high
+def is_int(value, low, high):
+    return isinstance(value, int) and not isinstance(value, bool) and low <= value <= high
+
+# Whether apply_batch() can apply an effect tuple to the engine's grid:
+# ('resonance', f) or ('set', row, col, value) with a cell inside it
+def valid_effect(effect, engine):
+    if len(effect) == 2 and effect[0] == 'resonance':
+        return is_int(effect[1], -MAX_FREQUENCY, MAX_FREQUENCY)
+    return (len(effect) == 4 and effect[0] == 'set' and is_int(effect[1], 0, engine.rows - 1)
+            and is_int(effect[2], 0, engine.cols - 1) and is_int(effect[3], 0, 9))
+
+# Effects from a batch request body: "frequencies" is shorthand for a run of
+# resonance effects, "effects" lists {"type": "resonance", "frequency": f}
+# and {"type": "set", "row": r, "col": c, "value": v} objects in order.
+# Anything else raises ValueError
+def parse_effects(data, manager):
+    if not isinstance(data, dict):
+        raise ValueError('expected a JSON object')
+    frequencies, requested = data.get('frequencies', []), data.get('effects', [])
+    if not isinstance(frequencies, list) or not isinstance(requested, list):
+        raise ValueError('frequencies and effects must be lists')
+    engine = manager.engine
+    effects = [('resonance', frequency) for frequency in frequencies]
+    if not all(valid_effect(effect, engine) for effect in effects):
+        raise ValueError('frequencies must be integers within int32')
+    for effect in requested:
+        kind = effect.get('type') if isinstance(effect, dict) else None
+        if kind == 'resonance':
+            parsed = ('resonance', effect.get('frequency'))
+        elif kind == 'set':
+            parsed = ('set', effect.get('row'), effect.get('col'), effect.get('value'))
+        else:
+            parsed = ()
+        if not valid_effect(parsed, engine):
+            raise ValueError(f'invalid effect: {effect}')
+        effects.append(parsed)
+    return effects
+
+def encode_json(manager, snapshot):
+    color_codes, average_color = manager.get_grid_state(snapshot)
+    return json.dumps({
+        'color_codes': color_codes,
+        'average_color': average_color
+    }, sort_keys=True)
+
+def binary_encoder(compression):
+    def encode_binary(manager, snapshot):
+        average = bytes(snapshot.average_rgb())
+        return wire.encode(snapshot.color_indices(), snapshot.palette.rgb, snapshot.version,
+                           average, compression)
+    return encode_binary
@@ -0,0 +1,275 @@
+import bisect
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+# Undo / replay history for a GridEngine, SpiralGrid or SpinGrid, optionally
+# persisted to a directory.
+#
+# Every versioned change is one fixed-size record in an operation log
+# (version, kind, three arguments, parent) of 48 bytes: a resonance click is
+# just its frequency, a cell write its position and value, a spiral click
+# its center and power. Anything that replaces the state wholesale (a load
+# from a shared store, an undo, a SpinGrid step, which rewrites every cell)
+# forces a full checkpoint instead, so replay never has to reproduce it.
+#
+# Full checkpoints (the grid's history_state(): arrays and numbers, plus the
+# version) are also taken every `checkpoint_every` records, and the log is
+# split into one segment per checkpoint. The state at any version is then
+# one checkpoint load plus a replay of at most checkpoint_every records from
+# a single segment. A checkpoint shares the grid's arrays the way a snapshot
+# does (they are frozen and the grid copies them before its next write), so
+# taking one costs no copy up front.
+#
+# With a directory, checkpoints are written there as compressed .npz files
+# on a background thread and segments as raw .ops files, and attach() brings
+# a restarted grid back to the latest recorded version. Without one they
+# stay in memory. Either way only the last `keep` checkpoints and their
+# segments are kept; older versions can no longer be reached.
+#
+# Undo does not rewind versions: it loads an earlier state as a new version,
+# so ETags and change logs keyed by version stay valid. Each record's parent
+# is the version whose state came before it, which for an undo is the
+# parent of the state it went back to, so repeated undos keep walking back.
+
+# Record kinds for the effects of coalesce.compose_effects and spiral clicks
+KINDS = {'resonance': 0, 'set': 1, 'spiral': 2}
+# Changes that are checkpointed rather than logged
+FULL_STATE = ('load', 'spin')
+
+# version, kind, a, b, c, parent
+RECORD_FIELDS = 6
+RECORD_BYTES = RECORD_FIELDS * 8
+
+CHECKPOINT_NAME = re.compile(r'checkpoint-(\d+)\.npz$')
+
+
+class History:
+    def __init__(self, directory=None, checkpoint_every=256, keep=8):
+        self.directory = directory
+        self.checkpoint_every = checkpoint_every
+        self.keep = keep
+        # Sorted versions of every checkpoint that can still be loaded
+        self.checkpoints = []
+        # In memory only: checkpoint version -> (state, parent) and finished
+        # segments
+        self._states = {}
+        self._segments = {}
+        # Records since the latest checkpoint, with room to grow
+        self._records = np.empty((64, RECORD_FIELDS), dtype=np.int64)
+        self._count = 0
+        self._ops_file = None
+        # Parent of the next LOAD record, set while seek() loads a state
+        self._load_parent = None
+        # Class of the attached grid, for replaying onto scratch copies
+        self._grid_class = None
+        self._writer = None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            self._writer = ThreadPoolExecutor(max_workers=1)
+            self.checkpoints = sorted(int(m.group(1)) for m in map(CHECKPOINT_NAME.match,
+                                                                 os.listdir(directory)) if m)
+
+    @property
+    def latest(self):
+        return self.checkpoints[-1] if self.checkpoints else None
+
+    def _path(self, kind, version):
+        suffix = 'npz' if kind == 'checkpoint' else 'ops'
+        return os.path.join(self.directory, f'{kind}-{version:012d}.{suffix}')
+
+    # Start recording a grid's changes. If the directory already holds a
+    # history the grid is first brought to its latest version; returns that
+    # version, or None when the history starts here.
+    def attach(self, engine):
+        self._grid_class = type(engine)
+        restored = self._restore(engine) if self.latest is not None else None
+        if restored is None:
+            self.checkpoint(engine, -1)
+        engine.history = self
+        return restored
+
+    # Called by the grid after every versioned change: ('resonance', f),
+    # ('set', x, y, value), ('spiral', x, y, power), ('spin',) or ('load',)
+    def record(self, engine, kind, a=0, b=0, c=0):
+        if kind in FULL_STATE:
+            parent = self._load_parent if self._load_parent is not None else engine.version - 1
+            self.checkpoint(engine, parent)
+            return
+        if self._count == len(self._records):
+            self._records = np.concatenate([self._records, np.empty_like(self._records)])
+        record = self._records[self._count]
+        record[:] = (engine.version, KINDS[kind], a, b, c, engine.version - 1)
+        self._count += 1
+        if self._ops_file is not None:
+            self._ops_file.write(record.tobytes())
+        if engine.version - self.latest >= self.checkpoint_every:
+            self.checkpoint(engine, engine.version - 1)
+
+    # Take a full checkpoint of the grid's current state and start a new log
+    # segment
+    def checkpoint(self, engine, parent):
+        # Shared with the grid, which copies before writing to it again
+        version, state = engine.version, engine.history_state()
+        self._finish_segment()
+        self.checkpoints.append(version)
+        if self.directory is None:
+            self._states[version] = (state, parent)
+        else:
+            self._writer.submit(save_checkpoint, self._path('checkpoint', version),
+                                state, version, parent)
+            # Unbuffered, so a crash loses at most the record being written
+            self._ops_file = open(self._path('ops', version), 'ab', buffering=0)
+        while len(self.checkpoints) > self.keep:
+            self._drop(self.checkpoints.pop(0))
+
+    # Forget the checkpoint at `version` and its segment
+    def _drop(self, version):
+        if self.directory is None:
+            del self._states[version]
+            self._segments.pop(version, None)
+        else:
+            # After any pending write of the same checkpoint
+            self._writer.submit(remove_files, self._path('checkpoint', version),
+                                self._path('ops', version))
+
+    def _finish_segment(self):
+        if self.latest is not None and self.directory is None:
+            self._segments[self.latest] = self._records[:self._count].copy()
+        if self._ops_file is not None:
+            self._ops_file.close()
+            self._ops_file = None
+        self._count = 0
+
+    # Records of the segment starting at checkpoint `version`
+    def segment(self, version):
+        if version == self.latest:
+            return self._records[:self._count]
+        if self.directory is None:
+            return self._segments[version]
+        return read_segment(self._path('ops', version))
+
+    # (state, parent) of the checkpoint at `version`
+    def load_checkpoint(self, version):
+        if self.directory is None:
+            return self._states[version]
+        if self._writer is not None:
+            # It may still be on its way to disk
+            self._writer.submit(lambda: None).result()
+        return load_checkpoint(self._path('checkpoint', version))
+
+    # (state, parent) of the grid at `version`: the nearest earlier
+    # checkpoint with the records after it replayed on a scratch grid
+    def state_at(self, version):
+        i = bisect.bisect_right(self.checkpoints, version) - 1
+        if i < 0:
+            raise ValueError(f'version {version} is no longer in the history')
+        base = self.checkpoints[i]
+        state, parent = self.load_checkpoint(base)
+        if version == base:
+            return state, parent
+        records = self.segment(base)
+        records = records[records[:, 0] <= version]
+        if not len(records) or records[-1, 0] != version:
+            raise ValueError(f'version {version} is not in the history')
+        scratch = self._grid_class.from_history_state(state)
+        for _, kind, a, b, c, _ in records.tolist():
+            replay(scratch, kind, a, b, c)
+        return scratch.history_state(), int(records[-1, 5])
+
+    # Load the state the grid had at `version`, as a new version
+    def seek(self, engine, version):
+        state, parent = self.state_at(version)
+        self._load_parent = parent
+        try:
+            engine.load_history_state(state, engine.version + 1)
+        finally:
+            self._load_parent = None
+        return engine.version
+
+    # Go back to the state before the latest change; returns the new version
+    def undo(self, engine):
+        parent = self.parent(engine.version)
+        if parent < 0:
+            raise ValueError('nothing to undo')
+        return self.seek(engine, parent)
+
+    # Version whose state came before the state at `version`, -1 for none
+    def parent(self, version):
+        i = bisect.bisect_right(self.checkpoints, version) - 1
+        if i < 0:
+            return -1
+        if self.checkpoints[i] == version:
+            return self.load_checkpoint(version)[1]
+        records = self.segment(self.checkpoints[i])
+        match = records[records[:, 0] == version]
+        return int(match[-1, 5]) if len(match) else -1
+
+    def _restore(self, engine):
+        base = self.latest
+        records = read_segment(self._path('ops', base))
+        # Load it as the live segment so state_at() can replay it
+        self._records = np.concatenate([records, np.empty((64, RECORD_FIELDS), dtype=np.int64)])
+        self._count = len(records)
+        version = int(records[-1, 0]) if len(records) else base
+        engine.load_history_state(self.state_at(version)[0], version)
+        # Continue the latest segment rather than checkpointing again
+        self._ops_file = open(self._path('ops', base), 'ab', buffering=0)
+        self._ops_file.truncate(len(records) * RECORD_BYTES)
+        return version
+
+    # Flush the log and wait for pending checkpoint writes
+    def close(self):
+        if self._ops_file is not None:
+            self._ops_file.close()
+            self._ops_file = None
+        if self._writer is not None:
+            self._writer.shutdown()
+            self._writer = None
+
+
+# Apply one logged change to a grid
+def replay(engine, kind, a, b, c):
+    if kind == KINDS['resonance']:
+        engine.apply_resonance(a)
+    elif kind == KINDS['set']:
+        engine.set_value(a, b, c)
+    elif kind == KINDS['spiral']:
+        engine.apply_spiral_effect(a, b, c)
+    else:
+        raise ValueError(f'cannot replay a record of kind {kind}')
+
+
+def save_checkpoint(path, state, version, parent):
+    tmp = f'{path}.tmp'
+    with open(tmp, 'wb') as f:
+        np.savez_compressed(f, version=version, parent=parent, **state)
+    os.replace(tmp, path)
+
+
+# (state, parent) saved by save_checkpoint()
+def load_checkpoint(path):
+    with np.load(path) as data:
+        state = {name: data[name] for name in data.files if name not in ('version', 'parent')}
+        return state, int(data['parent'])
+
+
+def remove_files(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+# Records of an .ops segment file, ignoring a torn last record
+def read_segment(path):
+    try:
+        with open(path, 'rb') as f:
+            data = f.read()
+    except FileNotFoundError:
+        return np.empty((0, RECORD_FIELDS), dtype=np.int64)
+    usable = len(data) - len(data) % RECORD_BYTES
+    return np.frombuffer(data[:usable], dtype='<i8').reshape(-1, RECORD_FIELDS).astype(np.int64)
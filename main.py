@@ -1,8 +1,12 @@
-import colorsys
 import random
 import tkinter as tk
 
-import pandas as pd
+from coalesce import combine_frequencies
+from grid_engine import GridEngine
+from grid_loader import load_grid
+from palette import resonance_palette
+from tk_render import bind_navigation, draw_image, make_renderer
+from tk_scheduler import FrameScheduler
 
 # Cell class to represent each cell in the grid
 
@@ -16,25 +20,23 @@ class Cell:
 
     # Calculate the color based on the value, schema, and machine set
     def calculate_color(self):
-        hue = (self.value * 36) % 360
-        if self.schema == 'schema1' and self.machine_set == 'set1':
-            hue += 50
-        elif self.schema == 'schema2' and self.machine_set == 'set2':
-            hue += 100
-        r, g, b = colorsys.hls_to_rgb(hue / 360, 0.5, 1)
-        return f'#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}'
+        return resonance_palette(self.schema, self.machine_set).hex[self.value % 10]
 
 # ResonanceGrid class to manage the grid
 
 
 class ResonanceGrid:
-    def __init__(self, matrix):
-        self.grid = [[Cell(value) for value in row] for row in matrix]
+    def __init__(self, matrix, lazy=False):
+        self.engine = GridEngine(matrix, lazy=lazy)
+        self.grid = self.engine.grid
         self.current_frequency = 1
 
-    # Display the grid on a canvas
-    def display(self, canvas):
+    # Display the grid on a canvas, as rectangles or as one scaled image
+    def display(self, canvas, backend='rectangles'):
         cell_size = 10
+        if backend == 'image':
+            draw_image(canvas, self.engine.rgb(), cell_size)
+            return
         for x, row in enumerate(self.grid):
             for y, cell in enumerate(row):
                 canvas.create_rectangle(y * cell_size, x * cell_size,
@@ -43,27 +45,12 @@ class ResonanceGrid:
 
     # Calculate the average color of the grid
     def average_color(self):
-        total_r = total_g = total_b = 0
-        total_cells = len(self.grid) * len(self.grid[0])
-        for row in self.grid:
-            for cell in row:
-                r, g, b = int(cell.color[1:3], 16), int(
-                    cell.color[3:5], 16), int(cell.color[5:7], 16)
-                total_r += r
-                total_g += g
-                total_b += b
-        avg_r = total_r / total_cells
-        avg_g = total_g / total_cells
-        avg_b = total_b / total_cells
-        return f'#{int(avg_r):02x}{int(avg_g):02x}{int(avg_b):02x}'
+        return self.engine.average_color()
 
     # Apply resonance effect to the grid
     def apply_resonance(self, frequency, root):
         self.current_frequency = frequency
-        for row in self.grid:
-            for cell in row:
-                cell.value = (cell.value + frequency) % 10
-                cell.color = cell.calculate_color()
+        self.engine.apply_resonance(frequency)
         avg_color = self.average_color()
         root.title(f"Resonance Grid Simulation - Average Color: {avg_color}")
 
@@ -73,7 +60,7 @@ class ResonanceGrid:
 def main():
     root = tk.Tk()
     root.title("Resonance Grid Simulation")
-    base_grid = pd.read_csv('a.csv', header=None).values.tolist()
+    base_grid = load_grid('a.csv')
 
     # Replace with your method of generating grid values
     resonance_grid = ResonanceGrid(base_grid)
@@ -81,18 +68,25 @@ def main():
     canvas = tk.Canvas(root, width=1000, height=1000)
     canvas.pack()
 
-    # Redraw the grid
+    # Rectangles for small grids, a single image with zoom and pan for big ones
+    renderer = make_renderer(canvas, resonance_grid.engine, 1000, 1000, cell_size=10)
+
+    # Redraw the grid, repainting only the cells whose color changed
     def redraw():
-        canvas.delete("all")
-        resonance_grid.display(canvas)
+        renderer.update(resonance_grid.engine)
+
+    # All clicks of a frame collapse into one resonance shift
+    def apply_clicks(frequencies):
+        resonance_grid.apply_resonance(combine_frequencies(frequencies), root)
+
+    scheduler = FrameScheduler(root, apply_clicks, redraw)
 
     # Event handler for mouse clicks
     def on_click(event):
-        frequency = random.randint(1, 9)
-        resonance_grid.apply_resonance(frequency, root)
-        redraw()
+        scheduler.submit(random.randint(1, 9))
 
     canvas.bind("<Button-1>", on_click)
+    bind_navigation(canvas, renderer, redraw)
     redraw()
     root.mainloop()
 
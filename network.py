@@ -1,7 +1,13 @@
 import tkinter as tk
-import pandas as pd
 import random
 
+from coalesce import merge_spirals
+from grid_loader import load_grid
+from palette import position_palette
+from spiral_grid import SpiralGrid
+from tk_render import bind_navigation, draw_image, make_renderer
+from tk_scheduler import FrameScheduler
+
 
 class Cell:
     def __init__(self, value, x, y):
@@ -12,10 +18,7 @@ class Cell:
 
     def calculate_color(self):
         # Custom color based on position and value
-        red = (self.value * 123 + self.x * 45) % 256
-        green = (self.value * 156 + self.y * 67) % 256
-        blue = (self.value * 189 + (self.x + self.y) * 89) % 256
-        return f'#{int(red):02x}{int(green):02x}{int(blue):02x}'
+        return position_palette.hex_at(self.value, self.x, self.y)
 
     def update_value_based_on_spiral(self, spiral_power):
         self.value = (self.value + spiral_power) % 360
@@ -24,18 +27,18 @@ class Cell:
 
 class GameGrid:
     def __init__(self, matrix):
-        self.grid = [[Cell(value, x, y) for y, value in enumerate(row)]
-                     for x, row in enumerate(matrix)]
+        self.spiral = SpiralGrid(matrix)
+        self.grid = self.spiral.grid
 
-    def apply_spiral_effect(self, x_center, y_center, spiral_power):
-        for x, row in enumerate(self.grid):
-            for y, cell in enumerate(row):
-                distance = ((x - x_center) ** 2 + (y - y_center) ** 2) ** 0.5
-                if distance <= spiral_power:
-                    cell.update_value_based_on_spiral(spiral_power)
+    # Only the bounding box of the disk is touched, through a cached mask
+    def apply_spiral_effect(self, x_center, y_center, spiral_power, repeat=1):
+        self.spiral.apply_spiral_effect(x_center, y_center, spiral_power, repeat)
 
-    def display(self, canvas):
+    def display(self, canvas, backend='rectangles'):
         cell_size = 10  # Size of each cell in pixels
+        if backend == 'image':
+            draw_image(canvas, self.spiral.rgb(), cell_size)
+            return
         for x, row in enumerate(self.grid):
             for y, cell in enumerate(row):
                 canvas.create_rectangle(y * cell_size, x * cell_size,
@@ -43,27 +46,42 @@ class GameGrid:
                                         fill=cell.color, outline='')
 
 
+# The spiral for a click at canvas pixel (px, py): centered on the cell the
+# renderer shows under the cursor, at its current zoom and pan
+def click_spiral(renderer, px, py, spiral_power=5):
+    row, col = renderer.cell_at(px, py)
+    return row, col, spiral_power
+
+
 def main():
     root = tk.Tk()
     root.title("Game Grid")
 
-    base_grid = pd.read_csv('a.csv', header=None).values.tolist()
+    base_grid = load_grid('a.csv')
     game_grid = GameGrid(base_grid)
 
     canvas = tk.Canvas(root, width=1000, height=1000)
     canvas.pack()
 
+    # Rectangles for small grids, a single image with zoom and pan for big ones
+    renderer = make_renderer(canvas, game_grid.spiral, 1000, 1000, cell_size=10)
+
+    # Only the cells inside the last spiral are repainted
     def redraw():
-        canvas.delete("all")
-        game_grid.display(canvas)
+        renderer.update(game_grid.spiral)
+
+    # Repeated clicks on the same spot within a frame are applied as one
+    def apply_clicks(clicks):
+        for (x, y, spiral_power), count in merge_spirals(clicks):
+            game_grid.apply_spiral_effect(x, y, spiral_power, count)
+
+    scheduler = FrameScheduler(root, apply_clicks, redraw)
 
     def on_click(event):
-        x, y = event.x // 10, event.y // 10
-        spiral_power = 5
-        game_grid.apply_spiral_effect(x, y, spiral_power)
-        redraw()
+        scheduler.submit(click_spiral(renderer, event.x, event.y))
 
     canvas.bind("<Button-1>", on_click)
+    bind_navigation(canvas, renderer, redraw)
     redraw()
     root.mainloop()
 
@@ -0,0 +1,93 @@
+import colorsys
+from functools import lru_cache
+
+import numpy as np
+
+# Precomputed color tables. Every color a grid can show is built once, kept as
+# numeric RGB for rendering and averaging, and as a ready-made '#rrggbb' string
+# for Tk and JSON, so no code path has to format or parse hex per cell.
+
+HEX_BYTES = [f'{i:02x}' for i in range(256)]
+
+# Hue offsets for the (schema, machine_set) pairs Cell.calculate_color knows about
+HUE_OFFSETS = {
+    ('schema1', 'set1'): 50,
+    ('schema2', 'set2'): 100,
+}
+
+
+def to_hex(r, g, b):
+    return f'#{HEX_BYTES[r]}{HEX_BYTES[g]}{HEX_BYTES[b]}'
+
+
+# '#rrggbb' strings for an (..., 3) uint8 RGB array, in row-major order
+def hex_strings(rgb):
+    return [to_hex(r, g, b) for r, g, b in np.asarray(rgb).reshape(-1, 3).tolist()]
+
+
+class Palette:
+    def __init__(self, rgb):
+        self.rgb = np.array(rgb, dtype=np.uint8)
+        self.rgb.setflags(write=False)
+        self.hex = [to_hex(r, g, b) for r, g, b in self.rgb.tolist()]
+
+    def __len__(self):
+        return len(self.hex)
+
+
+# Resonance colors: hue = value * 36 degrees, so only value % 10 matters
+@lru_cache(maxsize=None)
+def resonance_palette(schema='default_schema', machine_set='default_set'):
+    offset = HUE_OFFSETS.get((schema, machine_set), 0)
+    rgb = []
+    for value in range(10):
+        hue = value * 36 + offset
+        r, g, b = colorsys.hls_to_rgb(hue / 360, 0.5, 1)
+        rgb.append((int(r * 255), int(g * 255), int(b * 255)))
+    return Palette(rgb)
+
+
+# Position-based colors used by network.py:
+#   red   = (value * 123 + x * 45) % 256
+#   green = (value * 156 + y * 67) % 256
+#   blue  = (value * 189 + (x + y) * 89) % 256
+# Each term only depends on its input mod 256, so three 256-entry tables cover
+# every (value, x, y) and a color is the channel-wise sum of three lookups.
+class PositionPalette:
+    def __init__(self):
+        i = np.arange(256, dtype=np.uint16)
+        zero = np.zeros(256, dtype=np.uint16)
+        self.by_value = np.stack([(i * 123) % 256, (i * 156) % 256, (i * 189) % 256], axis=1)
+        self.by_x = np.stack([(i * 45) % 256, zero, (i * 89) % 256], axis=1)
+        self.by_y = np.stack([zero, (i * 67) % 256, (i * 89) % 256], axis=1)
+        self._value_rows = self.by_value.tolist()
+        self._x_rows = self.by_x.tolist()
+        self._y_rows = self.by_y.tolist()
+
+    def rgb_at(self, value, x, y):
+        v, px, py = self._value_rows[value % 256], self._x_rows[x % 256], self._y_rows[y % 256]
+        return ((v[0] + px[0]) % 256, (v[1] + py[1]) % 256, (v[2] + px[2] + py[2]) % 256)
+
+    def hex_at(self, value, x, y):
+        return to_hex(*self.rgb_at(value, x, y))
+
+    # RGB for individual cells given as parallel value / x / y arrays
+    def rgb_points(self, values, xs, ys):
+        rgb = self.by_value[np.asarray(values) % 256]
+        rgb += self.by_x[np.asarray(xs) % 256]
+        rgb += self.by_y[np.asarray(ys) % 256]
+        return (rgb % 256).astype(np.uint8)
+
+    # RGB for a whole (rows, cols) value array, optionally offset to a sub-grid
+    def rgb(self, values, x0=0, y0=0):
+        values = np.asarray(values)
+        rows, cols = values.shape
+        xs = np.arange(x0, x0 + rows) % 256
+        ys = np.arange(y0, y0 + cols) % 256
+        rgb = self.by_value[values % 256]
+        rgb += self.by_x[xs][:, None, :]
+        rgb += self.by_y[ys][None, :, :]
+        return (rgb % 256).astype(np.uint8)
+
+
+position_palette = PositionPalette()
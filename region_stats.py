@@ -0,0 +1,158 @@
+import numpy as np
+
+from palette import to_hex
+
+# Block prefix sums for constant-time statistics of any rectangle.
+#
+# The grid is cut into BLOCK x BLOCK blocks. The sum over rows [0, x) x cols
+# [0, y) is then put together from
+#
+#   blocks      prefix sums over whole blocks, one entry per block corner
+#   row strips  per block row: for each of its rows i and block column b,
+#               the sum over rows [block row start, i] x cols [0, b * BLOCK)
+#   col strips  the same per block column, with rows and columns swapped
+#
+# plus the cells of at most one partial block, summed on the fly, so a
+# rectangle costs four such lookups whatever its size. A change to a box of
+# cells only touches the strip rows and columns crossing it and the block
+# corners below and right of it, O(BLOCK x grid side) entries rather than the
+# whole grid.
+#
+# Every strip is its own array. copy() shares them all and writes copy only
+# the strips they touch, so a snapshot can keep a frozen BlockSums while the
+# engine goes on updating its own.
+#
+# The sums are built from a `channels(values, x0, x1, y0, y1)` function
+# returning the per-cell (h, w, k) channels of a sub-grid. Grids only build
+# them the first time a region is asked about.
+
+BLOCK = 32
+
+
+class BlockSums:
+    def __init__(self, values, channels, dtype=np.int64, block=None):
+        self.channels = channels
+        self.dtype = dtype
+        self.block = block or BLOCK
+        self.rows, self.cols = values.shape[:2]
+        b = self.block
+        n_rows, n_cols = -(-self.rows // b), -(-self.cols // b)
+        self.row_strips = [self._strip(channels(values, r0, min(r0 + b, self.rows), 0, self.cols))
+                           for r0 in range(0, self.rows, b)]
+        self.col_strips = [self._strip(channels(values, 0, self.rows, c0,
+                                                min(c0 + b, self.cols)).transpose(1, 0, 2))
+                           for c0 in range(0, self.cols, b)]
+        k = channels(values, 0, 0, 0, 0).shape[-1]
+        self.blocks = np.zeros((n_rows + 1, n_cols + 1, k), dtype=dtype)
+        for i, strip in enumerate(self.row_strips):
+            # The last row of a strip holds its whole block row
+            self.blocks[i + 1] = self.blocks[i] + strip[-1]
+
+    # (h, n, k) channels of a strip of h rows -> the strip's table of
+    # (h, blocks along n + 1, k) running sums
+    def _strip(self, data):
+        h, n, k = data.shape
+        b = self.block
+        padded = np.zeros((h, -(-n // b) * b, k), dtype=self.dtype)
+        padded[:, :n] = data
+        strip = np.zeros((h, padded.shape[1] // b + 1, k), dtype=self.dtype)
+        np.cumsum(padded.reshape(h, -1, b, k).sum(axis=2), axis=1, out=strip[:, 1:])
+        np.cumsum(strip, axis=0, out=strip)
+        return strip
+
+    # A copy sharing every array; writes to either copy the arrays they touch
+    def copy(self):
+        sums = BlockSums.__new__(BlockSums)
+        sums.__dict__.update(self.__dict__)
+        sums.row_strips = list(self.row_strips)
+        sums.col_strips = list(self.col_strips)
+        return sums
+
+    # Make every array read-only, before sharing them with copy()
+    def freeze(self):
+        for array in (self.blocks, *self.row_strips, *self.col_strips):
+            array.setflags(write=False)
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in (self.blocks, *self.row_strips, *self.col_strips))
+
+    # Per-channel totals of rows [0, x) x cols [0, y)
+    def _prefix(self, values, x, y):
+        b = self.block
+        bx, by, dx, dy = x // b, y // b, x % b, y % b
+        total = self.blocks[bx, by].astype(np.int64)
+        if dx:
+            total += self.row_strips[bx][dx - 1, by]
+        if dy:
+            total += self.col_strips[by][dy - 1, bx]
+        if dx and dy:
+            total += self.channels(values, x - dx, x, y - dy, y).sum(axis=(0, 1), dtype=np.int64)
+        return total
+
+    # Per-channel totals of rows [x0, x1) x cols [y0, y1); `values` is the
+    # grid the sums describe, for the partial blocks at the corners
+    def sum(self, values, x0, x1, y0, y1):
+        return (self._prefix(values, x1, y1) - self._prefix(values, x0, y1)
+                - self._prefix(values, x1, y0) + self._prefix(values, x0, y0))
+
+    # Add a (h, w, channels) delta to the box of cells starting at (x0, y0)
+    def add(self, x0, y0, delta):
+        delta = np.asarray(delta, dtype=self.dtype)
+        h, w = delta.shape[:2]
+        if h == 0 or w == 0:
+            return
+        self._add_strips(self.row_strips, x0, y0, delta)
+        self._add_strips(self.col_strips, y0, x0, delta.transpose(1, 0, 2))
+        b = self.block
+        bi0, bj0 = x0 // b, y0 // b
+        bi1, bj1 = (x0 + h - 1) // b + 1, (y0 + w - 1) // b + 1
+        aligned = np.zeros(((bi1 - bi0) * b, (bj1 - bj0) * b, delta.shape[2]), dtype=self.dtype)
+        aligned[x0 - bi0 * b:x0 - bi0 * b + h, y0 - bj0 * b:y0 - bj0 * b + w] = delta
+        block_totals = aligned.reshape(bi1 - bi0, b, bj1 - bj0, b, -1).sum(axis=(1, 3))
+        if not self.blocks.flags.writeable:
+            self.blocks = self.blocks.copy()
+        add_below_right(self.blocks, bi0 + 1, bj0 + 1,
+                        np.cumsum(np.cumsum(block_totals, axis=0), axis=1))
+
+    # Add a delta at (x0, y0) to strips cut along its first axis
+    def _add_strips(self, strips, x0, y0, delta):
+        h, w = delta.shape[:2]
+        b = self.block
+        bj0, bj1 = y0 // b, (y0 + w - 1) // b + 1
+        padded = np.zeros((h, (bj1 - bj0) * b, delta.shape[2]), dtype=self.dtype)
+        padded[:, y0 - bj0 * b:y0 - bj0 * b + w] = delta
+        # Running sums of each delta row over block columns bj0 .. bj1 - 1
+        across = np.cumsum(padded.reshape(h, bj1 - bj0, b, -1).sum(axis=2), axis=1)
+        for i in range(x0 // b, (x0 + h - 1) // b + 1):
+            a, z = max(x0, i * b), min(x0 + h, (i + 1) * b)
+            if not strips[i].flags.writeable:
+                strips[i] = strips[i].copy()
+            add_below_right(strips[i], a - i * b, bj0 + 1,
+                            np.cumsum(across[a - x0:z - x0], axis=0))
+
+
+# Add the (h, w, k) running sums `cum` to table[x:x + h, y:y + w] and extend
+# their last row and column over the rest of the table below and right
+def add_below_right(table, x, y, cum):
+    h, w = cum.shape[:2]
+    table[x:x + h, y:y + w] += cum
+    table[x:x + h, y + w:] += cum[:, -1:]
+    table[x + h:, y:y + w] += cum[-1]
+    table[x + h:, y + w:] += cum[-1, -1]
+
+
+# Statistics dict shared by every grid's region_stats(): cell count, mean
+# and standard deviation of the values, and the average color computed the
+# way average_color() does it
+def describe(count, rgb_totals, value_sum, square_sum):
+    if count == 0:
+        return {'count': 0, 'mean': None, 'std': None, 'average_color': '#000000'}
+    mean = value_sum / count
+    variance = max(square_sum / count - mean * mean, 0.0)
+    return {
+        'count': count,
+        'mean': mean,
+        'std': variance ** 0.5,
+        'average_color': to_hex(*(int(total / count) for total in rgb_totals)),
+    }
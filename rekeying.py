@@ -1,6 +1,8 @@
-import pandas as pd
 import random
 
+from grid_loader import load_grid
+from spin_grid import SpinGrid
+
 
 class Cell:
     def __init__(self, value):
@@ -25,21 +27,21 @@ class Cell:
 
 class GameGrid:
     def __init__(self, matrix):
-        self.grid = [[Cell(value) for value in row] for row in matrix]
+        self.spin = SpinGrid(matrix)
+        self.grid = self.spin.grid
 
     def display(self):
-        for row in self.grid:
-            print(' '.join(cell.color[0].upper() for cell in row))
+        for row in self.spin.color_names():
+            print(' '.join(name[0].upper() for name in row))
 
+    # Whole-grid stencil pass; colors are updated in the same sweep
     def spin_cells(self):
-        for x in range(len(self.grid)):
-            for y in range(len(self.grid[0])):
-                neighbors = self.get_neighbors_values(x, y)
-                self.grid[x][y].spin_effect(neighbors)
-        # After spinning, update colors
-        for x in range(len(self.grid)):
-            for y in range(len(self.grid[0])):
-                self.grid[x][y].update_color()
+        self.spin.step()
+
+    # Fast-forward up to `steps` spins, stopping early once the grid has
+    # settled to within tol; returns how many steps actually ran
+    def run(self, steps, tol=None, workers=1):
+        return self.spin.run(steps, tol, workers)
 
     def get_neighbors_values(self, x, y):
         # Get the values of neighboring cells
@@ -54,13 +56,17 @@ class GameGrid:
 
 def main():
     # Initialize the game grid with a sample matrix
-    base_grid = pd.read_csv('/a.csv', header=None).values.tolist()
+    base_grid = load_grid('/a.csv')
     game_grid = GameGrid(base_grid)
 
     while True:
         game_grid.display()
-        input("Press Enter to spin cells...")
-        game_grid.spin_cells()
+        answer = input("Press Enter to spin cells, or type a number of steps to fast-forward...")
+        if answer.strip().isdigit():
+            steps_run = game_grid.run(int(answer), tol=1e-9)
+            print(f"Ran {steps_run} steps, last max change {game_grid.spin.last_delta:.3g}")
+        else:
+            game_grid.spin_cells()
 
 
 if __name__ == "__main__":
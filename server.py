@@ -1,105 +1,179 @@
-import colorsys
+import os
 import random
 
-import pandas as pd
-from flask import Flask, jsonify, request
+from flask import Flask, jsonify, request, stream_with_context
 from flask_cors import CORS
 
+from coalesce import ClickCoalescer
+import wire
+from grid_loader import load_grid
+from grid_service import (Cell, GridManager, Ulid, binary_encoder, encode_json, parse_effects, ulid,
+                          valid_effect)
+from history import History
+from shared_store import SharedGridStore
+
+# Cell, Ulid and ulid lived here before grid_service; still importable from
+# server
+__all__ = ['app', 'grid_manager', 'Cell', 'GridManager', 'Ulid', 'ulid']
+
 app = Flask(__name__)
 CORS(app)
 
-class Ulid:  # A simple ULID generator
-    def __init__(self):
-        self.counter = 0
-
-    def new(self):
-        self.counter += 1
-        return f"00000000-0000-0000-0000-{self.counter:012x}"
-
-ulid = Ulid()
-
-class Cell:
-    def __init__(self, value):
-        self.id = ulid.new()
-        self.value = value
-        self.color = self.calculate_color()
-
-    def calculate_color(self):
-        hue = (self.value * 36) % 360
-        r, g, b = colorsys.hls_to_rgb(hue / 360, 0.5, 1)
-        return f'#{int(r * 255):02x}{int(g * 255):02x}{int(b * 255):02x}'
-
-    def set_value(self, new_value):
-        self.value = new_value
-        self.color = self.calculate_color()
-
-class GridManager:
-    def __init__(self, matrix):
-        self.grid = [[Cell(value) for value in row] for row in matrix]
-
-    def apply_resonance(self, frequency):
-        for row in self.grid:
-            for cell in row:
-                new_value = (cell.value + frequency) % 10
-                cell.set_value(new_value)
-
-    def get_grid_state(self):
-        flat_grid = [cell for row in self.grid for cell in row]
-        color_codes = {cell.id: cell.color for cell in flat_grid}
-        average_color = self.calculate_average_color(flat_grid)
-        return color_codes, average_color
-
-    def calculate_average_color(self, cells):
-        num_cells = len(cells)
-        if num_cells == 0:
-            return '#000000'
-        total_r = total_g = total_b = 0
-        for cell in cells:
-            hex_color = cell.color.lstrip('#')
-            r, g, b = tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
-            total_r += r
-            total_g += g
-            total_b += b
-        avg_r = int(total_r / num_cells)
-        avg_g = int(total_g / num_cells)
-        avg_b = int(total_b / num_cells)
-        return f'#{avg_r:02x}{avg_g:02x}{avg_b:02x}'
-
 # Initialize grid manager with dummy data
 try:
-    base_grid = pd.read_csv('a.csv', header=None).values.tolist()
+    base_grid = load_grid('a.csv')
 except FileNotFoundError:
     base_grid = [[random.randint(0, 9) for _ in range(10)] for _ in range(10)]  # Adjusted to 10x10 for simplicity
 
-grid_manager = GridManager(base_grid)
+# Set SIGHT_SHARED_GRID to a shared memory name to let several worker
+# processes (gunicorn -w N server:app) serve one grid
+shared_name = os.environ.get('SIGHT_SHARED_GRID')
+store = SharedGridStore(shared_name, base_grid) if shared_name else None
+# Undo history, kept in memory unless SIGHT_HISTORY_DIR names a directory to
+# checkpoint to and restore from on the next start (single process only)
+history = History(os.environ.get('SIGHT_HISTORY_DIR')) if store is None else None
+grid_manager = GridManager(base_grid, lazy=True, store=store, history=history)
+# Single clicks arriving within a few milliseconds share one grid pass
+clicks = ClickCoalescer(grid_manager.apply_batch)
 
 @app.route('/click', methods=['POST'])
 def handle_click():
-    data = request.json
+    data = request.get_json(silent=True)
     print(data)
-    frequency = data.get('frequency', 1)  # Default frequency to 1 if not provided
-    grid_manager.apply_resonance(frequency)
-    return jsonify(success=True)
+    # Default frequency to 1 if not provided
+    effect = ('resonance', data.get('frequency', 1) if isinstance(data, dict) else None)
+    if not valid_effect(effect, grid_manager.engine):
+        return jsonify(error='expected {"frequency": n}'), 400
+    version = clicks.submit([effect])
+    return jsonify(success=True, version=version)
+
+@app.route('/click/batch', methods=['POST'])
+def handle_click_batch():
+    try:
+        effects = parse_effects(request.get_json(silent=True), grid_manager)
+    except ValueError as error:
+        return jsonify(error=str(error)), 400
+    version = grid_manager.apply_batch(effects)
+    return jsonify(success=True, version=version, applied=len(effects))
+
+# Grid state from the per-version cache, tagged with an ETag so polling
+# clients can revalidate with If-None-Match and get an empty 304. Clients
+# that prefer wire.MIME_TYPE in Accept get the binary format, compressed as
+# ?compression=none|zlib|rle asks (zlib by default).
+def grid_response():
+    if request.accept_mimetypes.best_match(['application/json', wire.MIME_TYPE]) == wire.MIME_TYPE:
+        compression = request.args.get('compression', 'zlib')
+        if compression not in wire.COMPRESSION:
+            return jsonify(error=f'unknown compression: {compression}'), 400
+        fmt, mimetype = f'binary-{compression}', wire.MIME_TYPE
+        version, body = grid_manager.serialized(fmt, binary_encoder(compression))
+    else:
+        fmt, mimetype = 'json', 'application/json'
+        version, body = grid_manager.serialized(fmt, encode_json)
+    etag = f'{grid_manager.etag(version)}-{fmt}'
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = app.response_class(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    response.vary.add('Accept')
+    return response
 
 @app.route('/grid', methods=['GET'])
 def get_grid():
-    color_codes, average_color = grid_manager.get_grid_state()
-    return jsonify({
-        'color_codes': color_codes,
-        'average_color': average_color
-    })
-    
+    return grid_response()
+
+@app.route('/grid/cell/<int:row>/<int:col>', methods=['GET'])
+def get_cell(row, col):
+    if not (row < grid_manager.engine.rows and col < grid_manager.engine.cols):
+        return jsonify(error='cell out of range'), 404
+    return jsonify(grid_manager.get_cell(row, col))
+
+@app.route('/grid/cell/<cell_id>', methods=['GET'])
+def get_cell_by_id(cell_id):
+    index = grid_manager.cell_index(cell_id)
+    if index is None:
+        return jsonify(error='unknown cell id'), 404
+    return jsonify(grid_manager.get_cell(*divmod(index, grid_manager.engine.cols)))
+
+# Rows [r0, r1) x cols [c0, c1), clipped to the grid; missing bounds mean the edge
+def region_args():
+    engine = grid_manager.engine
+    r0 = min(max(request.args.get('r0', 0, type=int), 0), engine.rows)
+    c0 = min(max(request.args.get('c0', 0, type=int), 0), engine.cols)
+    r1 = min(max(request.args.get('r1', engine.rows, type=int), r0), engine.rows)
+    c1 = min(max(request.args.get('c1', engine.cols, type=int), c0), engine.cols)
+    return r0, c0, r1, c1
+
+@app.route('/grid/region', methods=['GET'])
+def get_region():
+    return jsonify(grid_manager.get_region(*region_args()))
+
+# Average color and value statistics of a region, e.g. a dashboard tile
+@app.route('/grid/average', methods=['GET'])
+def get_region_average():
+    return jsonify(grid_manager.get_region_stats(*region_args()))
+
+# Only the cells that changed since the client's version
+@app.route('/grid/changes', methods=['GET'])
+def get_grid_changes():
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify(error='since must be an integer version'), 400
+    return jsonify(grid_manager.get_changes(since))
+
+# Revert the latest change, or jump to the state of any earlier version;
+# either way the result is published as a new version
+@app.route('/grid/undo', methods=['POST'])
+def undo_grid():
+    if grid_manager.history is None:
+        return jsonify(error='history is not enabled'), 400
+    try:
+        version = grid_manager.undo()
+    except ValueError as error:
+        return jsonify(error=str(error)), 409
+    return jsonify(success=True, version=version)
+
+@app.route('/grid/seek', methods=['POST'])
+def seek_grid():
+    if grid_manager.history is None:
+        return jsonify(error='history is not enabled'), 400
+    data = request.get_json(silent=True)
+    target = data.get('version') if isinstance(data, dict) else None
+    if not isinstance(target, int):
+        return jsonify(error='expected {"version": n}'), 400
+    try:
+        version = grid_manager.seek(target)
+    except ValueError as error:
+        return jsonify(error=str(error)), 409
+    return jsonify(success=True, version=version)
+
+# Server-sent events pushing the same deltas as clicks happen. Reconnecting
+# clients resume from Last-Event-ID; new ones start with a full snapshot.
+@app.route('/grid/stream', methods=['GET'])
+def stream_grid():
+    since = request.headers.get('Last-Event-ID', type=int)
+    if since is None:
+        since = request.args.get('since', -1, type=int)
+
+    def events(version):
+        while True:
+            changes = grid_manager.get_changes(version)
+            if changes['version'] != version:
+                version = changes['version']
+                yield f"id: {version}\nevent: changes\ndata: {app.json.dumps(changes)}\n\n"
+            if not grid_manager.wait_for_change(version, timeout=15):
+                yield ": keep-alive\n\n"
+
+    return app.response_class(stream_with_context(events(since)), mimetype='text/event-stream',
+                              headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/', methods=['GET'])
 def index():
     # generate the grid and return the color codes and average color
-    color_codes, average_color = grid_manager.get_grid_state()
-    return jsonify({
-        'color_codes': color_codes,
-        'average_color': average_color
-    })
-    
-    
-    
+    return grid_response()
+
 
 if __name__ == '__main__':
     app.run(debug=True)
@@ -0,0 +1,362 @@
+import asyncio
+import json
+import os
+import random
+import time
+from urllib.parse import parse_qs
+
+import wire
+from grid_loader import load_grid
+from grid_service import GridManager, binary_encoder, encode_json, parse_effects, valid_effect
+from history import History
+
+# asyncio variant of server.py as a plain ASGI app, for any ASGI server:
+#
+#     uvicorn server_async:app --port 8001
+#
+# It serves the same /, /grid, /click, /click/batch, /grid/changes and
+# /grid/stream routes from the same GridManager, but requests never touch the
+# grid directly. A background tick running SIGHT_TICK_HZ times a second
+# (default 20) applies everything queued since the last tick as one batch,
+# together with server.ts-style random updates: 1-5 random cells every 1-10
+# seconds (SIGHT_RANDOM_UPDATES=0 turns them off). Every tick publishes at
+# most one new version, and streaming clients are woken once per tick.
+#
+# Backpressure: a click waits for the tick that applies it. Once more than
+# MAX_PENDING effects are queued (the tick has fallen behind) new clicks get
+# 503 with Retry-After until it catches up. A tick that overruns its period
+# starts the next one straight away instead of trying to make up for lost
+# ticks; overruns are counted in /stats.
+#
+# POST /grid/undo and /grid/seek go through the same history as server.py
+# (SIGHT_HISTORY_DIR to persist it); streams see the result on the next tick.
+
+MAX_PENDING = 10000
+KEEP_ALIVE = 15
+
+
+class Simulation:
+    def __init__(self, manager, hz=20, random_updates=True):
+        self.manager = manager
+        self.period = 1 / hz
+        self.random_updates = random_updates
+        # (effects, future) pairs waiting for the next tick
+        self.pending = []
+        self.pending_effects = 0
+        self.ticks = self.overruns = 0
+        self.changed = asyncio.Condition()
+        self._next_random = time.monotonic() + random.uniform(1, 10)
+        self._task = None
+        self._published = manager.version
+        # (since, version) -> SSE event; the cache is dropped on every change
+        self._events = {}
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self.run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    # Queue effects for the next tick; resolves to the version they produced.
+    # Effects are checked here and ValueError raised, so one bad click cannot
+    # fail the shared batch of a tick.
+    def submit(self, effects):
+        engine = self.manager.engine
+        if not all(valid_effect(effect, engine) for effect in effects):
+            raise ValueError('invalid effect')
+        if self.pending_effects >= MAX_PENDING:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        self.pending.append((effects, future))
+        self.pending_effects += len(effects)
+        return future
+
+    # Like server.ts randomUpdate: 1-5 random cells get random values
+    def random_effects(self):
+        engine = self.manager.engine
+        return [('set', random.randrange(engine.rows), random.randrange(engine.cols),
+                 random.randint(0, 9)) for _ in range(random.randint(1, 5))]
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        deadline = time.monotonic()
+        while True:
+            deadline += self.period
+            await self.tick(loop)
+            now = time.monotonic()
+            if now > deadline:
+                self.overruns += 1
+                deadline = now
+            await asyncio.sleep(deadline - now)
+
+    async def tick(self, loop):
+        self.ticks += 1
+        batch, self.pending, self.pending_effects = self.pending, [], 0
+        effects = [effect for submitted, _ in batch for effect in submitted]
+        random_due = self.random_updates and time.monotonic() >= self._next_random
+        if random_due:
+            effects += self.random_effects()
+        version = self.manager.version
+        if effects:
+            # Off the event loop: a cell write may copy the whole array. The
+            # effects were validated on submit, so a failure here is the
+            # grid's, and the random updates are retried on the next tick.
+            try:
+                version = await loop.run_in_executor(None, self.manager.apply_batch, effects)
+            except Exception as error:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(error)
+                return
+        if random_due:
+            self._next_random = time.monotonic() + random.uniform(1, 10)
+        for _, future in batch:
+            if not future.done():
+                future.set_result(version)
+        if version != self._published:
+            self._published = version
+            self._events = {}
+            async with self.changed:
+                self.changed.notify_all()
+
+    async def wait_for_change(self, version):
+        async with self.changed:
+            await self.changed.wait_for(lambda: self.manager.version != version)
+
+    # The SSE event taking a client from `since` to the current version,
+    # shared by every client at the same version
+    def event(self, since):
+        version = self.manager.version
+        event = self._events.get((since, version))
+        if event is None:
+            # A tick may land in between, so key the event by what it holds
+            changes = self.manager.get_changes(since)
+            version = changes['version']
+            event = f"id: {version}\nevent: changes\ndata: {json.dumps(changes, sort_keys=True)}\n\n"
+            event = self._events[since, version] = event.encode()
+        return version, event
+
+
+def load_base_grid():
+    try:
+        return load_grid('a.csv')
+    except FileNotFoundError:
+        return [[random.randint(0, 9) for _ in range(10)] for _ in range(10)]
+
+
+history = History(os.environ.get('SIGHT_HISTORY_DIR'))
+grid_manager = GridManager(load_base_grid(), lazy=True, history=history)
+simulation = Simulation(grid_manager, hz=float(os.environ.get('SIGHT_TICK_HZ', 20)),
+                        random_updates=os.environ.get('SIGHT_RANDOM_UPDATES', '1') != '0')
+
+CORS_HEADERS = [(b'access-control-allow-origin', b'*')]
+
+
+async def read_body(receive):
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            return body
+
+
+async def respond(send, status, body=b'', content_type=b'application/json', headers=()):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', content_type), (b'content-length', str(len(body)).encode()),
+                    *CORS_HEADERS, *headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def respond_json(send, status, data, headers=()):
+    await respond(send, status, json.dumps(data).encode(), headers=headers)
+
+
+# q-value of a media type in an Accept header, honoring type/* and */*
+def accept_quality(accept, mimetype):
+    best = {}
+    for part in accept.split(','):
+        media, *params = [p.strip() for p in part.split(';')]
+        quality = 1.0
+        for param in params:
+            if param.startswith('q='):
+                try:
+                    quality = float(param[2:])
+                except ValueError:
+                    quality = 0.0
+        best[media] = quality
+    for candidate in (mimetype, mimetype.split('/')[0] + '/*', '*/*'):
+        if candidate in best:
+            return best[candidate]
+    return 0.0
+
+
+def etag_matches(if_none_match, etag):
+    tags = [t.strip().removeprefix('W/') for t in if_none_match.split(',')]
+    return '*' in tags or f'"{etag}"' in tags
+
+
+# Same negotiation and caching as server.grid_response
+async def grid_response(send, headers, query):
+    accept = headers.get('accept', '*/*')
+    if accept_quality(accept, wire.MIME_TYPE) > accept_quality(accept, 'application/json'):
+        compression = query.get('compression', 'zlib')
+        if compression not in wire.COMPRESSION:
+            return await respond_json(send, 400, {'error': f'unknown compression: {compression}'})
+        fmt, mimetype = f'binary-{compression}', wire.MIME_TYPE
+        version, body = grid_manager.serialized(fmt, binary_encoder(compression))
+    else:
+        fmt, mimetype = 'json', 'application/json'
+        version, body = grid_manager.serialized(fmt, encode_json)
+    etag = f'{grid_manager.etag(version)}-{fmt}'
+    cache_headers = [(b'etag', f'"{etag}"'.encode()), (b'cache-control', b'no-cache'),
+                     (b'vary', b'Accept')]
+    if etag_matches(headers.get('if-none-match', ''), etag):
+        return await respond(send, 304, headers=cache_headers)
+    if isinstance(body, str):
+        body = body.encode()
+    await respond(send, 200, body, mimetype.encode(), cache_headers)
+
+
+async def click_response(send, effects):
+    try:
+        future = simulation.submit(effects)
+    except ValueError as error:
+        return await respond_json(send, 400, {'error': str(error)})
+    if future is None:
+        return await respond_json(send, 503, {'error': 'too many pending clicks'},
+                                  [(b'retry-after', b'1')])
+    version = await future
+    await respond_json(send, 200, {'success': True, 'version': version, 'applied': len(effects)})
+
+
+# Run an undo / seek off the event loop like a tick's batch
+async def history_response(send, action, *args):
+    try:
+        version = await asyncio.get_running_loop().run_in_executor(None, action, *args)
+    except ValueError as error:
+        return await respond_json(send, 409, {'error': str(error)})
+    await respond_json(send, 200, {'success': True, 'version': version})
+
+
+async def wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def stream_response(send, receive, since):
+    await send({
+        'type': 'http.response.start',
+        'status': 200,
+        'headers': [(b'content-type', b'text/event-stream'), (b'cache-control', b'no-cache'),
+                    (b'x-accel-buffering', b'no'), *CORS_HEADERS],
+    })
+    disconnected = asyncio.ensure_future(wait_for_disconnect(receive))
+    try:
+        while True:
+            version, event = simulation.event(since)
+            if version != since:
+                since = version
+                await send({'type': 'http.response.body', 'body': event, 'more_body': True})
+            waiter = asyncio.ensure_future(simulation.wait_for_change(since))
+            done, _ = await asyncio.wait({waiter, disconnected}, timeout=KEEP_ALIVE,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                waiter.cancel()
+                return
+            if not done:
+                waiter.cancel()
+                await send({'type': 'http.response.body', 'body': b': keep-alive\n\n',
+                            'more_body': True})
+    finally:
+        disconnected.cancel()
+
+
+async def http(scope, receive, send):
+    simulation.start()
+    method, path = scope['method'], scope['path']
+    headers = {k.decode('latin-1'): v.decode('latin-1') for k, v in scope['headers']}
+    query = {k: v[-1] for k, v in parse_qs(scope['query_string'].decode()).items()}
+
+    if method == 'GET' and path in ('/', '/grid'):
+        return await grid_response(send, headers, query)
+    if method == 'POST' and path == '/click':
+        try:
+            data = json.loads(await read_body(receive))
+        except ValueError:
+            data = None
+        effect = ('resonance', data.get('frequency', 1) if isinstance(data, dict) else None)
+        if not valid_effect(effect, grid_manager.engine):
+            return await respond_json(send, 400, {'error': 'expected {"frequency": n}'})
+        return await click_response(send, [effect])
+    if method == 'POST' and path == '/click/batch':
+        try:
+            effects = parse_effects(json.loads(await read_body(receive) or b'null'), grid_manager)
+        except (ValueError, TypeError) as error:
+            return await respond_json(send, 400, {'error': str(error)})
+        return await click_response(send, effects)
+    if method == 'POST' and path == '/grid/undo':
+        return await history_response(send, grid_manager.undo)
+    if method == 'POST' and path == '/grid/seek':
+        try:
+            version = json.loads(await read_body(receive))['version']
+            if not isinstance(version, int):
+                raise TypeError
+        except (ValueError, KeyError, TypeError):
+            return await respond_json(send, 400, {'error': 'expected {"version": n}'})
+        return await history_response(send, grid_manager.seek, version)
+    if method == 'GET' and path == '/grid/changes':
+        try:
+            since = int(query['since'])
+        except (KeyError, ValueError):
+            return await respond_json(send, 400, {'error': 'since must be an integer version'})
+        return await respond_json(send, 200, grid_manager.get_changes(since))
+    if method == 'GET' and path == '/grid/stream':
+        since = headers.get('last-event-id', query.get('since', '-1'))
+        try:
+            since = int(since)
+        except ValueError:
+            since = -1
+        return await stream_response(send, receive, since)
+    if method == 'GET' and path == '/stats':
+        return await respond_json(send, 200, {
+            'version': grid_manager.version,
+            'ticks': simulation.ticks,
+            'overruns': simulation.overruns,
+            'pending': simulation.pending_effects,
+        })
+    if method == 'OPTIONS':
+        return await respond(send, 204, headers=[
+            (b'access-control-allow-methods', b'GET, POST, OPTIONS'),
+            (b'access-control-allow-headers', b'Content-Type')])
+    await respond_json(send, 404, {'error': 'not found'})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            simulation.start()
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await simulation.stop()
+            history.close()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] == 'http':
+        return await http(scope, receive, send)
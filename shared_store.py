@@ -0,0 +1,141 @@
+import fcntl
+import os
+import secrets
+import tempfile
+import threading
+from contextlib import contextmanager
+from multiprocessing import resource_tracker, shared_memory
+
+import numpy as np
+
+# Grid state shared by several server processes (e.g. gunicorn workers).
+#
+# One shared memory block holds a small int64 header followed by the raw
+# int32 values array, stored exactly like a lazy GridEngine keeps them: the
+# values plus a pending resonance shift. Cross-process writes are serialized
+# by flock() on a lock file next to the block; within a process a thread lock
+# guards the same file descriptor, since flock() treats every thread of a
+# process as one owner. Readers take the lock too, but only to copy the block
+# when the version in the header moved, so a worker serves from its own
+# GridManager snapshot between writes.
+#
+# The block is not tied to any one process: it outlives the worker that
+# created it and is removed with unlink() (or `python -m shared_store unlink
+# NAME`) once the deployment is shut down.
+
+HEADER_FIELDS = 8
+READY, ROWS, COLS, VERSION, SHIFT, TOKEN = range(6)
+# SHIFT value meaning no pending shift (GridEngine._shift is None)
+NO_SHIFT = -1
+
+
+# Before Python 3.13 (no track=False) every process that creates or attaches
+# to a block registers it with a resource tracker, which unlinks it as soon
+# as that process exits. Keep the tracker out of it while opening and
+# unlinking.
+@contextmanager
+def _untracked():
+    register, unregister = resource_tracker.register, resource_tracker.unregister
+    resource_tracker.register = resource_tracker.unregister = lambda name, rtype: None
+    try:
+        yield
+    finally:
+        resource_tracker.register, resource_tracker.unregister = register, unregister
+
+
+class SharedGridStore:
+    # Attach to the block called `name`, creating it from `matrix` if it does
+    # not exist yet
+    def __init__(self, name, matrix=None):
+        self.name = name
+        self._thread_lock = threading.RLock()
+        self._depth = 0
+        self._lock_file = open(os.path.join(tempfile.gettempdir(), f'{name}.lock'), 'a')
+        with self.locked():
+            try:
+                with _untracked():
+                    self.shm = shared_memory.SharedMemory(name=name)
+                values = None
+            except FileNotFoundError:
+                if matrix is None:
+                    raise
+                values = np.asarray(matrix, dtype=np.int32)
+                with _untracked():
+                    self.shm = shared_memory.SharedMemory(
+                        name=name, create=True, size=HEADER_FIELDS * 8 + max(values.nbytes, 1))
+            self.header = np.ndarray(HEADER_FIELDS, dtype=np.int64, buffer=self.shm.buf)
+            if values is not None:
+                self.header[:] = 0
+                self.header[ROWS], self.header[COLS] = values.shape
+                self.header[SHIFT] = NO_SHIFT
+                self.header[TOKEN] = secrets.randbits(63)
+            elif not self.header[READY]:
+                raise RuntimeError(f'shared grid {name} was never initialized')
+            shape = (int(self.header[ROWS]), int(self.header[COLS]))
+            self.values = np.ndarray(shape, dtype=np.int32, buffer=self.shm.buf,
+                                     offset=HEADER_FIELDS * 8)
+            if values is not None:
+                self.values[...] = values
+                self.header[READY] = 1
+
+    # Random per-block token, so every worker tags its ETags the same way
+    @property
+    def token(self):
+        return f'{int(self.header[TOKEN]):016x}'
+
+    # Version of the shared state; read without locking, it is one aligned word
+    @property
+    def version(self):
+        return int(self.header[VERSION])
+
+    # Exclusive access across processes and threads. Reentrant, so a writer
+    # holding it can call read() / write().
+    @contextmanager
+    def locked(self):
+        with self._thread_lock:
+            if self._depth == 0:
+                fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+                if self._depth == 0:
+                    fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    # (values copy, shift, version) as GridEngine.load takes them
+    def read(self):
+        with self.locked():
+            shift = int(self.header[SHIFT])
+            return self.values.copy(), None if shift == NO_SHIFT else shift, self.version
+
+    # Store a new state; values=None keeps the stored array (only the shift
+    # and version moved)
+    def write(self, values, shift, version):
+        with self.locked():
+            if values is not None:
+                self.values[...] = values
+            self.header[SHIFT] = NO_SHIFT if shift is None else shift
+            self.header[VERSION] = version
+
+    def close(self):
+        del self.values, self.header
+        self.shm.close()
+        self._lock_file.close()
+
+    def unlink(self):
+        with _untracked():
+            self.shm.unlink()
+        try:
+            os.remove(self._lock_file.name)
+        except FileNotFoundError:
+            pass
+
+
+if __name__ == '__main__':
+    import sys
+    if len(sys.argv) != 3 or sys.argv[1] != 'unlink':
+        raise SystemExit('usage: python -m shared_store unlink NAME')
+    store = SharedGridStore(sys.argv[2])
+    store.close()
+    store.unlink()
@@ -0,0 +1,228 @@
+import numpy as np
+
+from grid_engine import RowView
+from palette import Palette
+
+# Array-backed spin simulation for rekeying.py / backup.py.
+#
+# GameGrid.spin_cells updates cells in place, row by row, so every cell
+# averages its already-updated upper and left neighbors with the not yet
+# updated right and lower ones. Cell (x, y) therefore depends on (x-1, y-1),
+# (x-1, y), (x-1, y+1) and (x, y-1), all of which lie on an earlier
+# wavefront t = 2x + y. Sweeping those wavefronts in order, each one as a
+# single vectorized stencil, performs exactly the additions and divisions of
+# the original loop, so the result matches it bit for bit.
+#
+# Values are kept in a zero-padded float64 array; adding the zero border in
+# place of a missing neighbor leaves the float sum unchanged, and the
+# precomputed neighbor counts divide edge and corner cells correctly.
+
+WHITE, BLUE, GREEN, RED = range(4)
+COLOR_NAMES = ('white', 'blue', 'green', 'red')
+# The same colors as Tk draws those names
+SPIN_PALETTE = Palette([(255, 255, 255), (0, 0, 255), (0, 255, 0), (255, 0, 0)])
+
+
+# Zero-padded float64 copy of a matrix
+def pad(matrix):
+    values = np.asarray(matrix, dtype=np.float64)
+    if values.ndim != 2:
+        raise ValueError('grid matrix must be two-dimensional')
+    padded = np.zeros((values.shape[0] + 2, values.shape[1] + 2))
+    padded[1:-1, 1:-1] = values
+    return padded
+
+
+# Number of in-bounds neighbors of every cell, padded like the values
+def neighbor_counts(rows, cols):
+    inside = np.zeros((rows + 2, cols + 2))
+    inside[1:-1, 1:-1] = 1
+    counts = np.zeros_like(inside)
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            if (dx, dy) != (0, 0):
+                counts[1:-1, 1:-1] += inside[1 + dx:rows + 1 + dx, 1 + dy:cols + 1 + dy]
+    return counts
+
+
+# Color code for spun values: < 2 blue, < 3 green, otherwise red
+def color_codes(values):
+    return (RED - (values < 3) - (values < 2)).astype(np.uint8)
+
+
+# One in-place spin step over grid rows [r0, r1). Rows r0 - 1 and r1 are read
+# as they currently are, exactly as the full sweep would see them. With
+# track_delta=True returns the largest absolute change of any cell.
+def sweep(padded, counts, codes, r0=0, r1=None, track_delta=False):
+    rows, width = padded.shape[0] - 2, padded.shape[1]
+    cols = width - 2
+    if r1 is None:
+        r1 = rows
+    max_delta = 0.0
+    if r0 >= r1 or cols == 0:
+        return max_delta
+    flat = padded.reshape(-1)
+    flat_counts = counts.reshape(-1)
+    flat_codes = codes.reshape(-1)
+    # Moving one row down and two columns left stays on the same wavefront
+    stride = width - 2
+    # Neighbor offsets in the order get_neighbors_values appends them
+    offsets = (-width - 1, -width, -width + 1, -1, 1, width - 1, width, width + 1)
+    for t in range(2 * r0, 2 * (r1 - 1) + cols):
+        x_lo = max(r0, (t - cols + 2) // 2)
+        x_hi = min(r1 - 1, t // 2)
+        if x_lo > x_hi:
+            continue
+        start = (x_lo + 1) * width + (t - 2 * x_lo) + 1
+        stop = start + (x_hi - x_lo) * stride + 1
+        total = flat[start + offsets[0]:stop + offsets[0]:stride] + \
+            flat[start + offsets[1]:stop + offsets[1]:stride]
+        for offset in offsets[2:]:
+            total += flat[start + offset:stop + offset:stride]
+        total /= flat_counts[start:stop:stride]
+        if track_delta:
+            max_delta = max(max_delta, float(np.abs(total - flat[start:stop:stride]).max()))
+        flat[start:stop:stride] = total
+        flat_codes[start:stop:stride] = color_codes(total)
+    return max_delta
+
+
+# View onto one cell with the old spin Cell interface
+class SpinCellView:
+    __slots__ = ('_engine', 'x', 'y')
+
+    def __init__(self, engine, x, y):
+        self._engine = engine
+        self.x = x
+        self.y = y
+
+    @property
+    def value(self):
+        return self._engine.get_value(self.x, self.y)
+
+    @value.setter
+    def value(self, new_value):
+        self._engine.set_value(self.x, self.y, new_value)
+
+    @property
+    def color(self):
+        return COLOR_NAMES[self._engine.codes[self.x + 1, self.y + 1]]
+
+    def spin_effect(self, neighbors):
+        self.value = sum(neighbors) / len(neighbors)
+
+    def update_color(self):
+        self._engine.update_color(self.x, self.y)
+
+    def __repr__(self):
+        return f'SpinCellView(x={self.x}, y={self.y}, value={self.value})'
+
+
+class SpinGrid:
+    view_class = SpinCellView
+
+    def __init__(self, matrix):
+        self.padded = pad(matrix)
+        self.rows, self.cols = self.padded.shape[0] - 2, self.padded.shape[1] - 2
+        self.counts = neighbor_counts(self.rows, self.cols)
+        # Cells stay white until their first spin, like the old Cell objects
+        self.codes = np.full(self.padded.shape, WHITE, dtype=np.uint8)
+        self.grid = [RowView(self, x) for x in range(self.rows)]
+        # Largest single-cell change during the last step run()
+        self.last_delta = None
+        # Bumped by every step() or run(), and recorded by an optional
+        # history.History. Cell writes through the views are not versioned;
+        # the next step's checkpoint includes them.
+        self.version = 0
+        self.history = None
+
+    @property
+    def values(self):
+        return self.padded[1:-1, 1:-1]
+
+    def get_value(self, x, y):
+        return float(self.padded[x + 1, y + 1])
+
+    def set_value(self, x, y, value):
+        self._own_arrays()
+        self.padded[x + 1, y + 1] = value
+
+    def update_color(self, x, y):
+        self._own_arrays()
+        self.codes[x + 1, y + 1] = color_codes(self.padded[x + 1, y + 1])
+
+    # Copy-on-write: a history checkpoint may share the arrays
+    def _own_arrays(self):
+        if not self.padded.flags.writeable:
+            self.padded = self.padded.copy()
+        if not self.codes.flags.writeable:
+            self.codes = self.codes.copy()
+
+    # A step rewrites every cell, so the history checkpoints it whole
+    # instead of logging it
+    def _stepped(self):
+        self.version += 1
+        if self.history is not None:
+            self.history.record(self, 'spin')
+
+    # The state a history.History checkpoints; the arrays are shared, so
+    # frozen
+    def history_state(self):
+        self.padded.setflags(write=False)
+        self.codes.setflags(write=False)
+        return {'padded': self.padded, 'codes': self.codes}
+
+    # Load a history_state() as `version`
+    def load_history_state(self, state, version):
+        self.padded, self.codes = state['padded'], state['codes']
+        self.version = version
+        if self.history is not None:
+            self.history.record(self, 'load')
+
+    # Scratch grid in a history_state()
+    @classmethod
+    def from_history_state(cls, state):
+        grid = cls(state['padded'][1:-1, 1:-1])
+        grid.codes = state['codes']
+        return grid
+
+    # Color names for the whole grid
+    def color_names(self):
+        return np.array(COLOR_NAMES)[self.codes[1:-1, 1:-1]]
+
+    # (rows, cols, 3) uint8 RGB buffer, optionally of a (x0, x1, y0, y1)
+    # sub-grid
+    def rgb(self, region=None):
+        codes = self.codes[1:-1, 1:-1]
+        if region is not None:
+            x0, x1, y0, y1 = region
+            codes = codes[x0:x1, y0:y1]
+        return SPIN_PALETTE.rgb[codes]
+
+    # Spin every cell once, coloring each wavefront as it is computed
+    def step(self):
+        self._own_arrays()
+        sweep(self.padded, self.counts, self.codes)
+        self._stepped()
+
+    # Run up to `steps` spins. With a tolerance, stop after the first step in
+    # which no cell moved by more than tol. Returns the number of steps run;
+    # a run is one version.
+    # workers > 1 runs the same computation on a process pool, see
+    # spin_parallel.run_parallel.
+    def run(self, steps, tol=None, workers=1):
+        self._own_arrays()
+        if workers > 1:
+            from spin_parallel import run_parallel
+            steps_run, self.last_delta = run_parallel(
+                self.padded, self.counts, self.codes, steps, workers, tol)
+        else:
+            steps_run = 0
+            for _ in range(steps):
+                self.last_delta = sweep(self.padded, self.counts, self.codes, track_delta=True)
+                steps_run += 1
+                if tol is not None and self.last_delta <= tol:
+                    break
+        if steps_run:
+            self._stepped()
+        return steps_run
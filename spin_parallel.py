@@ -0,0 +1,166 @@
+import multiprocessing as mp
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from spin_grid import sweep
+
+# Multi-process spin simulation over shared memory.
+#
+# The grid is cut into 2 * workers row strips and every array lives in shared
+# memory, so a strip's one-row halos are simply the neighboring strips' edge
+# rows. A serial sweep updates rows in place, so strip k needs strip k - 1's
+# rows from the *current* step but strip k + 1's rows from the *previous*
+# one. Running strip k's step s at stage 2s + k satisfies both: adjacent
+# strips are never active in the same stage, and a barrier between stages
+# publishes each strip's halo before its neighbor reads it. Every strip
+# performs exactly the serial arithmetic, so the result is bit-identical to
+# SpinGrid.run.
+#
+# Once the pipeline fills, every worker steps one of its two strips per
+# stage; a run of K steps over P workers takes 2K + 2P - 2 stages of 1/(2P)
+# of the grid each, so the speedup approaches P as K grows.
+
+
+class _SharedArray:
+    def __init__(self, array=None, shape=None, dtype=None, name=None):
+        if name is None:
+            shape, dtype = array.shape, array.dtype
+            self.shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+        self.array = np.ndarray(shape, dtype=dtype, buffer=self.shm.buf)
+        if array is not None:
+            self.array[...] = array
+
+    def spec(self):
+        return self.shm.name, self.array.shape, self.array.dtype.str
+
+    def close(self, unlink=False):
+        del self.array
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+
+def strip_bounds(rows, strips):
+    edges = np.linspace(0, rows, strips + 1).astype(int).tolist()
+    return list(zip(edges[:-1], edges[1:]))
+
+
+def _attach(spec):
+    name, shape, dtype = spec
+    return _SharedArray(shape=shape, dtype=np.dtype(dtype), name=name)
+
+
+def _worker(specs, strips, owned, chunks, stage_barrier, chunk_barrier):
+    shared = [_attach(spec) for spec in specs]
+    padded, counts, codes, deltas, control = (s.array for s in shared)
+    try:
+        for chunk in chunks:
+            for stage in range(2 * (chunk - 1) + len(strips)):
+                for k in owned:
+                    lag = stage - k
+                    if lag >= 0 and lag % 2 == 0 and lag // 2 < chunk:
+                        r0, r1 = strips[k]
+                        deltas[lag // 2, k] = sweep(padded, counts, codes, r0, r1, track_delta=True)
+                stage_barrier.wait()
+            # Let the parent inspect this chunk's deltas and decide whether to go on
+            chunk_barrier.wait()
+            chunk_barrier.wait()
+            if control[0]:
+                break
+    except Exception:
+        stage_barrier.abort()
+        chunk_barrier.abort()
+        raise
+    finally:
+        del padded, counts, codes, deltas, control
+        for s in shared:
+            s.close()
+
+
+# Run up to `steps` spins of a SpinGrid's arrays in place on `workers`
+# processes. With a tolerance the per-step deltas are checked after every
+# `check_every` steps. The pipeline has by then run past the step that first
+# settled, so the state at the start of that chunk (copied at every check)
+# is restored and run again for exactly the steps up to it; the result is
+# the serial run's. Returns (steps_run, last_delta).
+def run_parallel(padded, counts, codes, steps, workers, tol=None, check_every=64):
+    rows = padded.shape[0] - 2
+    strips = strip_bounds(rows, min(2 * workers, rows))
+    workers = (len(strips) + 1) // 2
+    if tol is None:
+        chunks = [steps] if steps else []
+    else:
+        chunks = [check_every] * (steps // check_every)
+        if steps % check_every:
+            chunks.append(steps % check_every)
+    if not chunks:
+        return 0, None
+
+    shared = [
+        _SharedArray(padded),
+        _SharedArray(counts),
+        _SharedArray(codes),
+        _SharedArray(np.zeros((max(chunks), len(strips)))),
+        _SharedArray(np.zeros(1, dtype=np.uint8)),
+    ]
+    ctx = mp.get_context()
+    stage_barrier = ctx.Barrier(workers)
+    chunk_barrier = ctx.Barrier(workers + 1)
+    specs = [s.spec() for s in shared]
+    processes = [
+        ctx.Process(target=_worker,
+                    args=(specs, strips, [k for k in (2 * w, 2 * w + 1) if k < len(strips)],
+                          chunks, stage_barrier, chunk_barrier))
+        for w in range(workers)
+    ]
+    steps_run, last_delta = 0, None
+    # Steps into the last chunk at which the run settled, and the (padded,
+    # codes) state that chunk started from; None while that is still in the
+    # caller's arrays
+    settled_at = start = None
+    try:
+        for p in processes:
+            p.start()
+        for chunk in chunks:
+            chunk_barrier.wait()
+            step_deltas = shared[3].array[:chunk].max(axis=1)
+            settled = np.flatnonzero(step_deltas <= tol) if tol is not None else []
+            if len(settled):
+                settled_at = int(settled[0]) + 1
+            else:
+                steps_run += chunk
+                last_delta = float(step_deltas[-1])
+                if tol is not None:
+                    # The workers are paused until the next wait
+                    start = shared[0].array.copy(), shared[2].array.copy()
+            shared[4].array[0] = settled_at is not None
+            chunk_barrier.wait()
+            if settled_at is not None:
+                break
+        for p in processes:
+            p.join()
+    except threading.BrokenBarrierError:
+        for p in processes:
+            p.join()
+        raise RuntimeError('spin worker failed; see worker traceback above') from None
+    finally:
+        for p in processes:
+            if p.is_alive():
+                p.terminate()
+        if settled_at is None:
+            start = shared[0].array, shared[2].array
+        if start is not None:
+            padded[...], codes[...] = start
+        for s in shared:
+            s.close(unlink=True)
+    if any(p.exitcode for p in processes):
+        raise RuntimeError('spin worker failed; see worker traceback above')
+    if settled_at is not None:
+        rerun, last_delta = run_parallel(padded, counts, codes, settled_at, workers)
+        steps_run += rerun
+    return steps_run, last_delta
+
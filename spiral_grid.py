@@ -0,0 +1,223 @@
+import math
+from functools import lru_cache
+
+import numpy as np
+
+from grid_engine import RowView
+from palette import hex_strings, position_palette
+from region_stats import BlockSums, describe
+
+# Array-backed grid for network.py's spiral effect. A click only changes cells
+# within spiral_power of the center, so the effect works on that bounding box
+# and a cached boolean disk mask instead of measuring every cell's distance.
+# The same box bounds the region_stats() block sums update.
+#
+# Values and spiral powers are integers: colors come from the position
+# palette's per-value tables, and history records are int64. Integral floats
+# such as 5.0 are accepted; anything else raises ValueError rather than being
+# truncated.
+
+
+# int(number), or ValueError when it is not a whole number
+def whole(number, what):
+    if not float(number).is_integer():
+        raise ValueError(f'{what} must be a whole number, got {number!r}')
+    return int(number)
+
+
+# Cells of a (2r + 1) x (2r + 1) box, r = floor(radius), whose squared
+# distance from the center is within radius ** 2
+@lru_cache(maxsize=64)
+def disk_mask(radius):
+    r = math.floor(radius)
+    offsets = np.arange(-r, r + 1)
+    mask = offsets[:, None] ** 2 + offsets[None, :] ** 2 <= radius * radius
+    mask.setflags(write=False)
+    return mask
+
+
+# Per-cell RGB, value and squared value of a sub-grid, the channels of the
+# region_stats() block sums
+def region_channels(values, x0, x1, y0, y1):
+    box = values[x0:x1, y0:y1]
+    channels = np.empty(box.shape + (5,), dtype=np.int64)
+    channels[..., :3] = position_palette.rgb(box, x0, y0)
+    channels[..., 3] = box
+    channels[..., 4] = box * box
+    return channels
+
+
+# View onto one cell with the old network Cell interface
+class SpiralCellView:
+    __slots__ = ('_engine', 'x', 'y')
+
+    def __init__(self, engine, x, y):
+        self._engine = engine
+        self.x = x
+        self.y = y
+
+    @property
+    def value(self):
+        return int(self._engine.values[self.x, self.y])
+
+    @value.setter
+    def value(self, new_value):
+        self._engine.set_value(self.x, self.y, new_value)
+
+    @property
+    def color(self):
+        return position_palette.hex_at(self.value, self.x, self.y)
+
+    def calculate_color(self):
+        return self.color
+
+    def update_value_based_on_spiral(self, spiral_power):
+        self.value = (self.value + spiral_power) % 360
+
+    def __repr__(self):
+        return f'SpiralCellView(x={self.x}, y={self.y}, value={self.value})'
+
+
+class SpiralGrid:
+    view_class = SpiralCellView
+
+    def __init__(self, matrix):
+        values = np.asarray(matrix)
+        if values.dtype.kind == 'f' and not np.all(np.isfinite(values) & (values % 1 == 0)):
+            raise ValueError('grid values must be whole numbers')
+        self.values = np.array(values, dtype=np.int64)
+        if self.values.ndim != 2:
+            raise ValueError('grid matrix must be two-dimensional')
+        self.rows, self.cols = self.values.shape
+        self.grid = [RowView(self, x) for x in range(self.rows)]
+        # Flat index arrays of cells changed since the last pop_dirty();
+        # None means every cell
+        self._dirty = None
+        # region_stats() block sums, built on first use
+        self._sums = None
+        # Bumped by every change, and recorded by an optional history.History
+        self.version = 0
+        self.history = None
+
+    @property
+    def size(self):
+        return self.rows * self.cols
+
+    # Copy-on-write: a history checkpoint may share the values array
+    def _own_values(self):
+        if not self.values.flags.writeable:
+            self.values = self.values.copy()
+
+    def _changed(self, kind, a, b, c):
+        self.version += 1
+        if self.history is not None:
+            self.history.record(self, kind, a, b, c)
+
+    def set_value(self, x, y, value):
+        value = whole(value, 'cell value')
+        self._own_values()
+        before = region_channels(self.values, x, x + 1, y, y + 1) if self._sums is not None else None
+        self.values[x, y] = value
+        if before is not None:
+            self._sums.add(x, y, region_channels(self.values, x, x + 1, y, y + 1) - before)
+        self.mark_dirty(x * self.cols + y)
+        self._changed('set', x, y, value)
+
+    # The state a history.History checkpoints; the array is shared, so frozen
+    def history_state(self):
+        self.values.setflags(write=False)
+        return {'values': self.values}
+
+    # Load a history_state() as `version`
+    def load_history_state(self, state, version):
+        self.values = state['values']
+        self.version = version
+        self._dirty = None
+        self._sums = None
+        if self.history is not None:
+            self.history.record(self, 'load')
+
+    # Scratch grid in a history_state(), for replaying records onto
+    @classmethod
+    def from_history_state(cls, state):
+        return cls(state['values'])
+
+    def mark_dirty(self, indices):
+        if self._dirty is not None:
+            self._dirty.append(np.asarray(indices, dtype=np.int64).ravel())
+
+    # Bounding box of the disk around (x_center, y_center) clipped to the
+    # grid, as (x0, x1, y0, y1, mask) or None when nothing is inside
+    def disk_region(self, x_center, y_center, radius):
+        if radius < 0:
+            return None
+        r = math.floor(radius)
+        x0, x1 = max(x_center - r, 0), min(x_center + r + 1, self.rows)
+        y0, y1 = max(y_center - r, 0), min(y_center + r + 1, self.cols)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        mask = disk_mask(radius)[x0 - x_center + r:x1 - x_center + r,
+                                 y0 - y_center + r:y1 - y_center + r]
+        return x0, x1, y0, y1, mask
+
+    # repeat > 1 applies the same click several times in one pass, except
+    # with a history, which logs each click as its own version
+    def apply_spiral_effect(self, x_center, y_center, spiral_power, repeat=1):
+        spiral_power = whole(spiral_power, 'spiral power')
+        if self.history is not None and repeat > 1:
+            for _ in range(repeat):
+                self.apply_spiral_effect(x_center, y_center, spiral_power)
+            return
+        region = self.disk_region(x_center, y_center, spiral_power)
+        if region is None:
+            return
+        x0, x1, y0, y1, mask = region
+        self._own_values()
+        before = region_channels(self.values, x0, x1, y0, y1) if self._sums is not None else None
+        box = self.values[x0:x1, y0:y1]
+        box[mask] = (box[mask] + spiral_power * repeat) % 360
+        if before is not None:
+            self._sums.add(x0, y0, region_channels(self.values, x0, x1, y0, y1) - before)
+        xs, ys = np.nonzero(mask)
+        self.mark_dirty((xs + x0) * self.cols + ys + y0)
+        self._changed('spiral', x_center, y_center, spiral_power)
+
+    # Flat indices of the cells changed since the last call, or None if every
+    # cell may have changed
+    def pop_dirty(self):
+        dirty, self._dirty = self._dirty, []
+        if dirty is None:
+            return None
+        if not dirty:
+            return np.empty(0, dtype=np.int64)
+        return np.unique(np.concatenate(dirty))
+
+    # Color of every cell in row-major order, or of the given flat indices
+    def colors(self, indices=None):
+        if indices is None:
+            return hex_strings(self.rgb())
+        indices = np.asarray(indices)
+        xs, ys = np.divmod(indices, self.cols)
+        return hex_strings(position_palette.rgb_points(self.values.ravel()[indices], xs, ys))
+
+    # (rows, cols, 3) uint8 RGB buffer for rendering, optionally of a
+    # (x0, x1, y0, y1) sub-grid
+    def rgb(self, region=None):
+        if region is None:
+            return position_palette.rgb(self.values)
+        x0, x1, y0, y1 = region
+        return position_palette.rgb(self.values[x0:x1, y0:y1], x0, y0)
+
+    # RGB of the cells at rows x cols (index arrays), for sampled rendering
+    def rgb_sample(self, rows, cols):
+        values = self.values[np.ix_(rows, cols)]
+        return position_palette.rgb_points(values, rows[:, None], cols[None, :])
+
+    # Count, value mean / std and average color of a (x0, x1, y0, y1)
+    # region, or of the whole grid, in constant time
+    def region_stats(self, region=None):
+        x0, x1, y0, y1 = region if region is not None else (0, self.rows, 0, self.cols)
+        if self._sums is None:
+            self._sums = BlockSums(self.values, region_channels)
+        totals = self._sums.sum(self.values, x0, x1, y0, y1).tolist()
+        return describe((x1 - x0) * (y1 - y0), totals[:3], totals[3], totals[4])
@@ -0,0 +1,43 @@
+import sys
+import types
+
+import numpy as np
+import pytest
+
+from benchmarks.bench_render import StubCanvas, StubPhotoImage
+
+# A click on the network.py canvas spirals around the cell drawn under the
+# cursor, on a non-square grid and after zooming and panning
+
+
+@pytest.fixture
+def network(monkeypatch):
+    stub = types.ModuleType('tkinter')
+    stub.Canvas, stub.PhotoImage = StubCanvas, StubPhotoImage
+    monkeypatch.setitem(sys.modules, 'tkinter', stub)
+    monkeypatch.delitem(sys.modules, 'network', raising=False)
+    import network
+    return network
+
+
+def views(tk_render):
+    small = tk_render.CanvasRenderer(StubCanvas(), cell_size=10)
+    zoomed = tk_render.ImageRenderer(StubCanvas(), 400, 300, cell_size=10)
+    zoomed.zoom(2.0, 50, 30)
+    zoomed.pan(-35, -120)
+    return [small, zoomed]
+
+
+@pytest.mark.parametrize('view', [0, 1])
+@pytest.mark.parametrize('px, py', [(25, 173), (310, 41), (3, 288)])
+def test_click_spirals_around_cell_under_cursor(network, view, px, py):
+    import tk_render
+    renderer = views(tk_render)[view]
+    game_grid = network.GameGrid(np.zeros((40, 70), dtype=int))
+    row, col = renderer.cell_at(px, py)
+    x, y, power = network.click_spiral(renderer, px, py, spiral_power=1)
+    game_grid.apply_spiral_effect(x, y, power)
+    changed = {tuple(cell) for cell in np.argwhere(game_grid.spiral.values)}
+    assert changed == {(r, c) for r, c in [(row, col), (row - 1, col), (row + 1, col),
+                                           (row, col - 1), (row, col + 1)]
+                       if 0 <= r < 40 and 0 <= c < 70}
@@ -0,0 +1,89 @@
+import asyncio
+import json
+
+import pytest
+
+import server
+import server_async
+
+# /click and /click/batch answer malformed bodies with 400 on both servers,
+# using the same rules as parse_effects
+
+BAD_CLICKS = [
+    b'{"frequency": "abc"}',
+    b'{"frequency": 1.7}',
+    b'{"frequency": true}',
+    b'{"frequency": 4294967296}',
+    b'{"frequency": null}',
+    b'null',
+    b'[3]',
+    b'not json',
+    b'',
+]
+
+BAD_BATCHES = [
+    b'{"frequencies": 5}',
+    b'{"frequencies": [true]}',
+    b'{"frequencies": [4294967296]}',
+    b'{"effects": [{"type": "set", "row": 0, "col": 0, "value": 10}]}',
+    b'{"effects": [{"type": "set", "row": -1, "col": 0, "value": 1}]}',
+    b'{"effects": [{"type": "spin"}]}',
+    b'not json',
+]
+
+
+@pytest.fixture
+def client():
+    return server.app.test_client()
+
+
+@pytest.mark.parametrize('body', BAD_CLICKS)
+def test_click_rejects_bad_body(client, body):
+    version = server.grid_manager.version
+    response = client.post('/click', data=body, content_type='application/json')
+    assert response.status_code == 400
+    assert 'error' in response.get_json()
+    assert server.grid_manager.version == version
+
+
+@pytest.mark.parametrize('body', BAD_BATCHES)
+def test_click_batch_rejects_bad_body(client, body):
+    response = client.post('/click/batch', data=body, content_type='application/json')
+    assert response.status_code == 400
+
+
+def test_click_applies_frequency(client):
+    version = server.grid_manager.version
+    response = client.post('/click', json={'frequency': 3})
+    assert response.status_code == 200
+    assert response.get_json()['version'] > version
+    assert client.post('/click', json={}).status_code == 200
+
+
+# Status of one request to the ASGI app. Rejected clicks never reach the
+# simulation, so it does not have to be running.
+def async_status(path, body):
+    scope = {'type': 'http', 'method': 'POST', 'path': path, 'headers': [],
+             'query_string': b''}
+    messages = [{'type': 'http.request', 'body': body, 'more_body': False}]
+    sent = []
+
+    async def receive():
+        return messages.pop(0) if messages else {'type': 'http.disconnect'}
+
+    async def send(message):
+        sent.append(message)
+
+    asyncio.run(server_async.app(scope, receive, send))
+    assert 'error' in json.loads(sent[1]['body'])
+    return sent[0]['status']
+
+
+@pytest.mark.parametrize('body', BAD_CLICKS)
+def test_async_click_rejects_bad_body(body):
+    assert async_status('/click', body) == 400
+
+
+@pytest.mark.parametrize('body', BAD_BATCHES)
+def test_async_click_batch_rejects_bad_body(body):
+    assert async_status('/click/batch', body) == 400
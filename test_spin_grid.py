@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+
+from rekeying import Cell
+from spin_grid import SpinGrid
+
+# SpinGrid against the per-cell loop GameGrid.spin_cells ran before it was
+# array-backed, and the process-pool run against the serial one. Both must
+# match bit for bit, including on single-row and single-column grids.
+
+SHAPES = [(1, 2), (1, 7), (7, 1), (2, 2), (5, 9), (13, 4)]
+
+
+# The original GameGrid.spin_cells over a list of rekeying.Cell rows
+def legacy_spin_cells(grid):
+    rows, cols = len(grid), len(grid[0])
+    for x in range(rows):
+        for y in range(cols):
+            neighbors = [grid[nx][ny].value
+                         for nx in (x - 1, x, x + 1) for ny in (y - 1, y, y + 1)
+                         if 0 <= nx < rows and 0 <= ny < cols and (nx, ny) != (x, y)]
+            grid[x][y].spin_effect(neighbors)
+    for row in grid:
+        for cell in row:
+            cell.update_color()
+
+
+def random_matrix(shape, integers=True):
+    rng = np.random.default_rng(shape[0] * 100 + shape[1])
+    return rng.integers(0, 10, shape) if integers else rng.random(shape) * 10
+
+
+@pytest.mark.parametrize('integers', [True, False])
+@pytest.mark.parametrize('shape', SHAPES)
+def test_step_matches_legacy_loop(shape, integers):
+    matrix = random_matrix(shape, integers)
+    cells = [[Cell(value) for value in row] for row in matrix.tolist()]
+    grid = SpinGrid(matrix)
+    for _ in range(4):
+        legacy_spin_cells(cells)
+        grid.step()
+        assert grid.values.tolist() == [[cell.value for cell in row] for row in cells]
+        assert grid.color_names().tolist() == [[cell.color for cell in row] for row in cells]
+
+
+@pytest.mark.parametrize('shape, workers', [((1, 6), 2), ((6, 1), 3), ((9, 7), 2), ((16, 5), 4)])
+def test_parallel_run_matches_serial(shape, workers):
+    matrix = random_matrix(shape)
+    serial, parallel = SpinGrid(matrix), SpinGrid(matrix)
+    assert serial.run(6) == parallel.run(6, workers=workers) == 6
+    assert np.array_equal(serial.padded, parallel.padded)
+    assert np.array_equal(serial.codes, parallel.codes)
+    assert serial.last_delta == parallel.last_delta
+
+
+@pytest.mark.parametrize('shape', [(12, 12), (5, 30), (30, 30)])
+def test_parallel_run_stops_at_settling_step(shape):
+    matrix = random_matrix(shape)
+    serial, parallel = SpinGrid(matrix), SpinGrid(matrix)
+    steps = serial.run(1000, tol=1e-3)
+    assert 0 < steps < 1000
+    assert parallel.run(1000, tol=1e-3, workers=2) == steps
+    assert np.array_equal(serial.padded, parallel.padded)
+    assert np.array_equal(serial.codes, parallel.codes)
+    assert serial.last_delta == parallel.last_delta
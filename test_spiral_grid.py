@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+
+from spiral_grid import SpiralGrid
+
+# SpiralGrid against the per-cell loop of the original network.GameGrid, and
+# its rule that values and spiral powers are whole numbers
+
+
+# The original apply_spiral_effect over a list of value rows
+def legacy_spiral(values, x_center, y_center, spiral_power):
+    for x, row in enumerate(values):
+        for y, value in enumerate(row):
+            distance = ((x - x_center) ** 2 + (y - y_center) ** 2) ** 0.5
+            if distance <= spiral_power:
+                row[y] = (value + spiral_power) % 360
+
+
+@pytest.mark.parametrize('shape', [(1, 9), (9, 1), (12, 17)])
+def test_spiral_matches_legacy_loop(shape):
+    rng = np.random.default_rng(shape[0] * 100 + shape[1])
+    matrix = rng.integers(0, 360, shape)
+    values = matrix.tolist()
+    grid = SpiralGrid(matrix)
+    clicks = [(0, 0, 5), (shape[0] - 1, shape[1] // 2, 3), (4, 4, 0), (2, 3, -2),
+              (-6, 3, 7), (shape[0] + 2, shape[1] + 2, 4), (3, 5, 400), (1, 2, 7.0)]
+    for x, y, power in clicks:
+        legacy_spiral(values, x, y, power)
+        grid.apply_spiral_effect(x, y, power)
+        assert grid.values.tolist() == values
+
+
+@pytest.mark.parametrize('power', [2.5, 7.9, -0.5, float('nan'), float('inf')])
+def test_fractional_power_is_rejected(power):
+    grid = SpiralGrid(np.zeros((5, 5), dtype=int))
+    with pytest.raises(ValueError):
+        grid.apply_spiral_effect(2, 2, power)
+    assert not grid.values.any() and grid.version == 0
+
+
+def test_fractional_values_are_rejected():
+    with pytest.raises(ValueError):
+        SpiralGrid([[1.0, 2.5], [3.0, 4.0]])
+    with pytest.raises(ValueError):
+        SpiralGrid([[1.0, float('nan')]])
+    grid = SpiralGrid([[1.0, 2.0], [3.0, 4.0]])
+    assert grid.values.tolist() == [[1, 2], [3, 4]]
+    with pytest.raises(ValueError):
+        grid.set_value(0, 0, 1.5)
+    grid.grid[0][1].value = 9.0
+    assert grid.values.tolist() == [[1, 9], [3, 4]]
@@ -0,0 +1,183 @@
+import math
+
+import numpy as np
+
+# Tk canvas renderers for the grid front ends.
+#
+# CanvasRenderer is retained-mode: rectangles are created once and kept by
+# item id, and each update only reconfigures cells whose color actually
+# changed, using the dirty set the grid collected since the previous frame.
+# Nothing else may delete its canvas items, so do not combine it with
+# canvas.delete("all").
+#
+# ImageRenderer blits the grid's RGB buffer into a single PhotoImage per
+# frame, which stays fast long after one rectangle per cell stops being
+# usable, and supports zooming and panning over grids larger than the window.
+#
+# Both work with any grid exposing rows, cols, size, colors(indices=None),
+# rgb(region=None), rgb_sample(rows, cols) and pop_dirty() (GridEngine,
+# SpiralGrid).
+
+# Beyond this many cells the rectangle renderer is not worth using
+RECTANGLE_LIMIT = 200 * 200
+
+
+class CanvasRenderer:
+    def __init__(self, canvas, cell_size=10):
+        self.canvas = canvas
+        self.cell_size = cell_size
+        self.items = None
+        self.shown = None
+
+    # (row, col) of the cell under a canvas pixel
+    def cell_at(self, px, py):
+        return py // self.cell_size, px // self.cell_size
+
+    def _create(self, grid):
+        size = self.cell_size
+        self.canvas.delete("all")
+        self.shown = grid.colors()
+        self.items = []
+        for index, color in enumerate(self.shown):
+            x, y = divmod(index, grid.cols)
+            self.items.append(self.canvas.create_rectangle(
+                y * size, x * size, (y + 1) * size, (x + 1) * size,
+                fill=color, outline=''))
+
+    # Bring the canvas in line with the grid; returns how many cells were repainted
+    def update(self, grid):
+        dirty = grid.pop_dirty()
+        if self.items is None or len(self.items) != grid.size:
+            self._create(grid)
+            return grid.size
+        if dirty is None:
+            indices, colors = range(grid.size), grid.colors()
+        else:
+            indices, colors = dirty.tolist(), grid.colors(dirty)
+        shown, items, itemconfig = self.shown, self.items, self.canvas.itemconfig
+        changed = 0
+        for index, color in zip(indices, colors):
+            if shown[index] != color:
+                itemconfig(items[index], fill=color)
+                shown[index] = color
+                changed += 1
+        return changed
+
+
+# PPM (P6) bytes for an (h, w, 3) uint8 buffer; Tk's PhotoImage reads these
+# without any per-pixel work on the Python side
+def ppm_bytes(rgb):
+    height, width = rgb.shape[:2]
+    return b'P6 %d %d 255\n' % (width, height) + np.ascontiguousarray(rgb).tobytes()
+
+
+# Draw a whole RGB buffer as one image scaled by cell_size. The PhotoImage is
+# kept on the canvas so Tk does not lose it to garbage collection.
+def draw_image(canvas, rgb, cell_size=10):
+    import tkinter as tk
+    rgb = np.repeat(np.repeat(rgb, cell_size, axis=0), cell_size, axis=1)
+    canvas.grid_photo = tk.PhotoImage(data=ppm_bytes(rgb), format='PPM')
+    canvas.create_image(0, 0, anchor='nw', image=canvas.grid_photo)
+
+
+class ImageRenderer:
+    def __init__(self, canvas, width, height, cell_size=10):
+        import tkinter as tk
+        self.canvas = canvas
+        self.width = width
+        self.height = height
+        # Pixels per cell; below 1 several cells share a pixel
+        self.scale = float(cell_size)
+        # Cell coordinates (row, col) shown at the top-left pixel
+        self.top = 0.0
+        self.left = 0.0
+        self.photo = tk.PhotoImage(width=width, height=height)
+        self.canvas.delete("all")
+        self.item = canvas.create_image(0, 0, anchor='nw', image=self.photo)
+        self._view_changed = True
+
+    def cell_at(self, px, py):
+        return math.floor(self.top + py / self.scale), math.floor(self.left + px / self.scale)
+
+    # Zoom by factor while keeping the cell under pixel (px, py) in place
+    def zoom(self, factor, px=0, py=0):
+        row, col = self.top + py / self.scale, self.left + px / self.scale
+        self.scale = min(max(self.scale * factor, 1 / 64), 256.0)
+        self.top, self.left = row - py / self.scale, col - px / self.scale
+        self._view_changed = True
+
+    def pan(self, dx, dy):
+        self.left -= dx / self.scale
+        self.top -= dy / self.scale
+        self._view_changed = True
+
+    # Visible pixel span [p0, p1) along one axis, the distinct cells it shows
+    # and, for every pixel in the span, which of those cells it belongs to
+    def _axis(self, origin, pixels, cells):
+        index = np.floor(origin + np.arange(pixels) / self.scale).astype(np.int64)
+        visible = np.flatnonzero((index >= 0) & (index < cells))
+        if len(visible) == 0:
+            return None
+        p0, p1 = visible[0], visible[-1] + 1
+        distinct, inverse = np.unique(index[p0:p1], return_inverse=True)
+        return p0, p1, distinct, inverse
+
+    # (height, width, 3) frame of the visible part of the grid. Each visible
+    # cell is colored once and then stretched over its pixels.
+    def frame(self, grid):
+        buffer = np.zeros((self.height, self.width, 3), dtype=np.uint8)
+        rows = self._axis(self.top, self.height, grid.rows)
+        cols = self._axis(self.left, self.width, grid.cols)
+        if rows is not None and cols is not None:
+            y0, y1, row_cells, row_pixels = rows
+            x0, x1, col_cells, col_pixels = cols
+            if row_cells[-1] - row_cells[0] < len(row_cells) and \
+                    col_cells[-1] - col_cells[0] < len(col_cells):
+                # Zoomed in: the visible cells are one contiguous block
+                cells = grid.rgb((row_cells[0], row_cells[-1] + 1, col_cells[0], col_cells[-1] + 1))
+            else:
+                cells = grid.rgb_sample(row_cells, col_cells)
+            buffer[y0:y1, x0:x1] = np.take(np.take(cells, row_pixels, axis=0), col_pixels, axis=1)
+        return buffer
+
+    # Redraw if anything changed; returns the number of pixels pushed to Tk
+    def update(self, grid):
+        dirty = grid.pop_dirty()
+        if dirty is not None and len(dirty) == 0 and not self._view_changed:
+            return 0
+        self._view_changed = False
+        self.photo.configure(data=ppm_bytes(self.frame(grid)), format='PPM')
+        return self.width * self.height
+
+
+# Pick the rectangle renderer for small grids and the image one otherwise
+def make_renderer(canvas, grid, width, height, cell_size=10):
+    if grid.size <= RECTANGLE_LIMIT:
+        return CanvasRenderer(canvas, cell_size)
+    return ImageRenderer(canvas, width, height, cell_size)
+
+
+# Mouse wheel zooms and right-button drag pans an ImageRenderer
+def bind_navigation(canvas, renderer, redraw):
+    if not isinstance(renderer, ImageRenderer):
+        return
+    drag = {}
+
+    def on_wheel(event):
+        up = getattr(event, 'num', None) == 4 or getattr(event, 'delta', 0) > 0
+        renderer.zoom(1.25 if up else 0.8, event.x, event.y)
+        redraw()
+
+    def on_press(event):
+        drag['x'], drag['y'] = event.x, event.y
+
+    def on_drag(event):
+        renderer.pan(event.x - drag['x'], event.y - drag['y'])
+        drag['x'], drag['y'] = event.x, event.y
+        redraw()
+
+    canvas.bind('<MouseWheel>', on_wheel)
+    canvas.bind('<Button-4>', on_wheel)
+    canvas.bind('<Button-5>', on_wheel)
+    canvas.bind('<ButtonPress-3>', on_press)
+    canvas.bind('<B3-Motion>', on_drag)
@@ -0,0 +1,44 @@
+import time
+
+# Frame-coalescing event scheduler for the Tk front ends. Clicks are queued
+# instead of handled one by one; at most once per frame the whole queue is
+# handed to apply_batch, which folds it into a single grid update, and the
+# canvas is redrawn once. The window title shows the last frame time and the
+# number of clicks that frame absorbed.
+
+
+class FrameScheduler:
+    def __init__(self, root, apply_batch, redraw, fps=30):
+        self.root = root
+        self.apply_batch = apply_batch
+        self.redraw = redraw
+        self.interval = 1 / fps
+        self.queue = []
+        self.pending = None
+        self.last_frame = 0.0
+        self.frame_time = 0.0
+
+    def submit(self, item):
+        self.queue.append(item)
+        if self.pending is None:
+            wait = self.last_frame + self.interval - time.perf_counter()
+            self.pending = self.root.after(max(int(wait * 1000), 0), self._frame)
+
+    def _frame(self):
+        self.pending = None
+        batch, self.queue = self.queue, []
+        start = time.perf_counter()
+        if batch:
+            self.apply_batch(batch)
+        self.redraw()
+        self.last_frame = time.perf_counter()
+        self.frame_time = self.last_frame - start
+        self._show_stats(len(batch))
+        # Clicks that arrived while this frame ran start the next one
+        if self.queue and self.pending is None:
+            wait = self.last_frame + self.interval - time.perf_counter()
+            self.pending = self.root.after(max(int(wait * 1000), 0), self._frame)
+
+    def _show_stats(self, depth):
+        title = self.root.title().split(' | frame ')[0]
+        self.root.title(f"{title} | frame {self.frame_time * 1000:.1f} ms | queue {depth}")
@@ -0,0 +1,89 @@
+import struct
+import zlib
+
+import numpy as np
+
+# Compact binary encoding of a grid snapshot, offered on /grid next to the
+# JSON color_codes map. Cells are implicit by position (row-major) and each
+# one is a single byte indexing the palette sent in the header:
+#
+#   magic 'SGRD' | format u8 | compression u8 | palette size u8 | pad
+#   rows u32 | cols u32 | grid version u64 | average color rgb | pad
+#   palette: palette size * rgb | body
+#
+# All integers are little-endian. The body is the raw index bytes, zlib
+# deflate of them, or run-length pairs (count 1-255, index).
+#
+# Run-length pairs only pay off on grids with long runs of one color. On a
+# noisy grid like a.csv nearly every cell is its own run, so the body is
+# about twice the raw one (19,770 against 10,058 bytes at 100 x 100) and far
+# larger than zlib's; zlib is the default.
+
+MIME_TYPE = 'application/x-sight-grid'
+MAGIC = b'SGRD'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sBBBxIIQ3sx')
+COMPRESSION = {'none': 0, 'zlib': 1, 'rle': 2}
+
+
+def rle_encode(data):
+    data = np.frombuffer(data, dtype=np.uint8)
+    if len(data) == 0:
+        return b''
+    starts = np.flatnonzero(np.concatenate(([True], data[1:] != data[:-1])))
+    lengths = np.diff(np.append(starts, len(data)))
+    values = data[starts]
+    # Runs longer than 255 are split into several pairs
+    pieces = (lengths + 254) // 255
+    counts = np.full(pieces.sum(), 255, dtype=np.int64)
+    ends = np.cumsum(pieces) - 1
+    counts[ends] = lengths - (pieces - 1) * 255
+    pairs = np.empty((len(counts), 2), dtype=np.uint8)
+    pairs[:, 0] = counts
+    pairs[:, 1] = np.repeat(values, pieces)
+    return pairs.tobytes()
+
+
+def rle_decode(data):
+    pairs = np.frombuffer(data, dtype=np.uint8).reshape(-1, 2)
+    return np.repeat(pairs[:, 1], pairs[:, 0]).tobytes()
+
+
+def encode(indices, palette_rgb, version, average_rgb, compression='zlib'):
+    indices = np.ascontiguousarray(indices, dtype=np.uint8)
+    rows, cols = indices.shape
+    palette_rgb = np.asarray(palette_rgb, dtype=np.uint8)
+    body = indices.tobytes()
+    if compression == 'zlib':
+        body = zlib.compress(body, 6)
+    elif compression == 'rle':
+        body = rle_encode(body)
+    elif compression != 'none':
+        raise ValueError(f'unknown compression: {compression}')
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, COMPRESSION[compression], len(palette_rgb),
+                         rows, cols, version, bytes(average_rgb))
+    return header + palette_rgb.tobytes() + body
+
+
+# Parse a payload back into its parts; used by clients and to check encodings
+def decode(data):
+    magic, fmt, compression, palette_size, rows, cols, version, average = \
+        HEADER.unpack_from(data)
+    if magic != MAGIC or fmt != FORMAT_VERSION:
+        raise ValueError('not a sight grid payload')
+    offset = HEADER.size + palette_size * 3
+    palette = np.frombuffer(data[HEADER.size:offset], dtype=np.uint8).reshape(-1, 3)
+    body = data[offset:]
+    if compression == COMPRESSION['zlib']:
+        body = zlib.decompress(body)
+    elif compression == COMPRESSION['rle']:
+        body = rle_decode(body)
+    indices = np.frombuffer(body, dtype=np.uint8).reshape(rows, cols)
+    return {
+        'rows': rows,
+        'cols': cols,
+        'version': version,
+        'average_color': '#' + average.hex(),
+        'palette': palette,
+        'indices': indices,
+    }